@@ -1,81 +1,93 @@
-import time
-from datetime import datetime
+import logging
+from line_protocol import CRLF, LineProtocol, serve_async, serve_blocking
+
+logger = logging.getLogger(__name__)
+
+BANNER = b'+OK POP3 server ready' + CRLF
+USER_ACCEPTED = b'+OK User accepted' + CRLF
+NO_USER = b'-ERR No user name provided' + CRLF
+PASS_ACCEPTED = b'+OK Pass accepted' + CRLF
+NO_PASSWORD = b'-ERR No password provided' + CRLF
+NO_SUCH_MESSAGE = b'-ERR No such message' + CRLF
+NO_MESSAGE_NUMBER = b'-ERR No message number provided' + CRLF
+DELETED = b'+OK Message deleted' + CRLF
+SIGNING_OFF = b'+OK POP3 server signing off' + CRLF
+UNKNOWN = b'-ERR Unknown command' + CRLF
+
+MESSAGES = {
+    1: (160, b'Subject: Test Message 1\r\n\r\nThis is a test message 1.'),
+    2: (160, b'Subject: Test Message 2\r\n\r\nThis is a test message 2.'),
+}
+
+
+class Pop3Session(LineProtocol):
+    banner = BANNER
+    unknown_reply = UNKNOWN
+
+    def __init__(self):
+        super().__init__()
+        self.authenticated = False
+        self.messages = dict(MESSAGES)
+
+    def line_received(self, line):
+        command = line.strip().partition(b' ')[0].upper()
+        if command in self.transaction_commands and not self.authenticated:
+            return UNKNOWN
+        return super().line_received(line)
+
+    def message_number(self, argument):
+        try:
+            return int(argument.split()[0])
+        except (IndexError, ValueError):
+            return None
+
+    def user(self, argument):
+        return USER_ACCEPTED if argument else NO_USER
+
+    def password(self, argument):
+        if not argument:
+            return NO_PASSWORD
+        self.authenticated = True
+        return PASS_ACCEPTED
+
+    def stat(self, argument):
+        total_size = sum(size for size, _ in self.messages.values())
+        return b'+OK %d %d\r\n' % (len(self.messages), total_size)
+
+    def list(self, argument):
+        lines = [b'+OK %d messages\r\n' % len(self.messages)]
+        lines.extend(b'%d %d\r\n' % (number, size) for number, (size, _) in self.messages.items())
+        lines.append(b'.\r\n')
+        return b''.join(lines)
+
+    def retrieve(self, argument):
+        if not argument:
+            return NO_MESSAGE_NUMBER
+        message = self.messages.get(self.message_number(argument))
+        if message is None:
+            return NO_SUCH_MESSAGE
+        size, content = message
+        return b'+OK %d octets\r\n%s\r\n.\r\n' % (size, content)
+
+    def delete(self, argument):
+        if not argument:
+            return NO_MESSAGE_NUMBER
+        if self.messages.pop(self.message_number(argument), None) is None:
+            return NO_SUCH_MESSAGE
+        return DELETED
+
+    def quit(self, argument):
+        self.closed = True
+        return SIGNING_OFF
+
+    commands = {b'USER': user, b'PASS': password, b'STAT': stat, b'LIST': list, b'RETR': retrieve,
+                b'DELE': delete, b'QUIT': quit}
+    transaction_commands = frozenset((b'STAT', b'LIST', b'RETR', b'DELE'))
+
 
 def handle_110(conn, addr, server):
-    server.log_connection_start(addr, 110)
-    start_time = datetime.now()
-    
-    def send_response(message):
-        conn.send(f"{message}\r\n".encode())
-    
-    messages = [
-        {"id": 1, "size": 160, "content": "Subject: Test Message 1\r\n\r\nThis is a test message 1."},
-        {"id": 2, "size": 160, "content": "Subject: Test Message 2\r\n\r\nThis is a test message 2."},
-    ]
-    
-    authenticated = False
-    send_response("+OK POP3 server ready")
-
-    try:
-        while True:
-            data = conn.recv(1024).decode()
-            if not data:
-                break
-
-            command, *args = data.strip().split()
-            command = command.upper()
-            
-            if command == 'USER':
-                if args:
-                    user = args[0]
-                    send_response("+OK User accepted")
-                else:
-                    send_response("-ERR No user name provided")
-            elif command == 'PASS':
-                if args:
-                    password = args[0]
-                    authenticated = True
-                    send_response("+OK Pass accepted")
-                else:
-                    send_response("-ERR No password provided")
-            elif command == 'STAT' and authenticated:
-                total_size = sum(msg["size"] for msg in messages)
-                send_response(f"+OK {len(messages)} {total_size}")
-            elif command == 'LIST' and authenticated:
-                send_response(f"+OK {len(messages)} messages")
-                for msg in messages:
-                    send_response(f"{msg['id']} {msg['size']}")
-                send_response(".")
-            elif command == 'RETR' and authenticated:
-                if args:
-                    msg_id = int(args[0])
-                    message = next((msg for msg in messages if msg["id"] == msg_id), None)
-                    if message:
-                        send_response(f"+OK {message['size']} octets")
-                        send_response(message["content"])
-                        send_response(".")
-                    else:
-                        send_response("-ERR No such message")
-                else:
-                    send_response("-ERR No message number provided")
-            elif command == 'DELE' and authenticated:
-                if args:
-                    msg_id = int(args[0])
-                    message = next((msg for msg in messages if msg["id"] == msg_id), None)
-                    if message:
-                        messages.remove(message)
-                        send_response("+OK Message deleted")
-                    else:
-                        send_response("-ERR No such message")
-                else:
-                    send_response("-ERR No message number provided")
-            elif command == 'QUIT':
-                send_response("+OK POP3 server signing off")
-                break
-            else:
-                send_response("-ERR Unknown command")
-
-            server.capture_payload(addr, data.encode())
-    finally:
-        conn.close()
-        server.log_connection_end(addr, start_time)
\ No newline at end of file
+    serve_blocking(Pop3Session(), conn, addr, server, 110, logger)
+
+
+async def async_handle_110(reader, writer, addr, server):
+    await serve_async(Pop3Session(), reader, writer, addr, server, 110, logger)
@@ -1,56 +1,48 @@
 import logging
-from datetime import datetime
-import socket
+from line_protocol import CRLF, LineProtocol, serve_async, serve_blocking
+
+logger = logging.getLogger(__name__)
+
+BANNER = b'220 Welcome to the FTP honeypot' + CRLF
+PASSWORD_REQUIRED = b'331 Password required for user.' + CRLF
+LOGGED_IN = b'230 User logged in, proceed.' + CRLF
+TRANSFER = b'150 Opening data connection.' + CRLF + b'226 Transfer complete.' + CRLF
+GOODBYE = b'221 Goodbye.' + CRLF
+COMMAND_OK = b'200 Command okay.' + CRLF
+NOT_LOGGED_IN = b'530 Not logged in.' + CRLF
+
+
+class FtpSession(LineProtocol):
+    banner = BANNER
+
+    def __init__(self):
+        super().__init__()
+        self.authenticated = False
+
+    def user(self, argument):
+        return PASSWORD_REQUIRED
+
+    def password(self, argument):
+        self.authenticated = True
+        return LOGGED_IN
+
+    def store(self, argument):
+        # No data connection is opened; whatever the client pushes next is captured with the session.
+        return TRANSFER
+
+    def quit(self, argument):
+        self.closed = True
+        return GOODBYE
+
+    def unknown_command(self, command, argument):
+        return COMMAND_OK if self.authenticated else NOT_LOGGED_IN
+
+    commands = {b'USER': user, b'PASS': password, b'STOR': store, b'QUIT': quit}
+
 
 def handle_21(conn, addr, honeypot_server):
-    start_time = datetime.now()
-    honeypot_server.log_connection_start(addr, 21)
-    welcome_message = "220 Welcome to the FTP honeypot\n"
-    conn.sendall(welcome_message.encode())
-    logging.info(f"Sent welcome message to {addr}")
-    authenticated = False
-    try:
-        while True:
-            conn.settimeout(5)
-            try:
-                command = conn.recv(1024).decode().strip()
-                if not command:
-                    logging.debug(f"No command received from {addr}.")
-                    break
-                logging.debug(f"FTP command from {addr}: {command}")
-                if command.lower().startswith('user'):
-                    conn.sendall("331 Password required for user.\n".encode())
-                    logging.info(f"Sent password required message to {addr}")
-                elif command.lower().startswith('pass'):
-                    conn.sendall("230 User logged in, proceed.\n".encode())
-                    logging.info(f"Sent login successful message to {addr}")
-                    authenticated = True
-                elif command.lower().startswith('stor'):
-                    conn.sendall("150 Opening data connection.\n".encode())
-                    logging.info(f"Sent opening data connection message to {addr}")
-                    data = conn.recv(1024)
-                    honeypot_server.capture_payload(addr, data)
-                    conn.sendall("226 Transfer complete.\n".encode())
-                    logging.info(f"Sent transfer complete message to {addr}")
-                elif command.lower() == 'quit':
-                    conn.sendall("221 Goodbye.\n".encode())
-                    logging.info(f"Sent goodbye message to {addr}")
-                    break
-                elif authenticated:
-                    conn.sendall("200 Command okay.\n".encode())
-                    logging.info(f"Sent command okay message to {addr}")
-                else:
-                    conn.sendall("530 Not logged in.\n".encode())
-                    logging.info(f"Sent not logged in message to {addr}")
-            except socket.timeout:
-                logging.debug(f"Connection from {addr} timed out.")
-                break
-            except Exception as e:
-                logging.error(f"Error handling FTP command from {addr}: {e}")
-                break
-    except Exception as e:
-        logging.error(f"Unexpected error handling FTP connection from {addr}: {e}")
-    finally:
-        conn.close()
-        honeypot_server.log_connection_end(addr, start_time)
-        logging.info(f"Connection from {addr} ended. Duration: {datetime.now() - start_time}")
+    serve_blocking(FtpSession(), conn, addr, honeypot_server, 21, logger)
+
+
+async def async_handle_21(reader, writer, addr, honeypot_server):
+    await serve_async(FtpSession(), reader, writer, addr, honeypot_server, 21, logger)
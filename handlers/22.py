@@ -1,25 +1,42 @@
+import asyncio
 import logging
 from datetime import datetime
-import time
+
+FAKE_BANNER = "SSH-2.0-OpenSSH_7.9p1 Debian-10+deb9u1\r\n"
 
 def handle_22(conn, addr, honeypot_server):
     start_time = datetime.now()
     honeypot_server.log_connection_start(addr, 22)
     try:
-        fake_banner = "SSH-2.0-OpenSSH_7.9p1 Debian-10+deb9u1\r\n"
-        conn.sendall(fake_banner.encode())
-        # Fake delay to simulate more realistic SSH interaction
-        time.sleep(2)
-        honeypot_server.honeypot_logger.debug(f"SSH banner sent to {addr}")
+        conn.sendall(FAKE_BANNER.encode())
+        honeypot_server.honeypot_logger.debug("SSH banner sent to %s", addr)
 
         data = conn.recv(1024)
         if data:
             honeypot_server.capture_payload(addr, data)
         else:
-            honeypot_server.honeypot_logger.info(f"No data received from {addr}")
+            honeypot_server.honeypot_logger.info("No data received from %s", addr)
+    except Exception as e:
+        honeypot_server.security_logger.error("Error handling SSH connection from %s: %s", addr, e)
+    finally:
+        honeypot_server.cleanup_socket(conn)
+        honeypot_server.log_connection_end(addr, start_time)
+
+async def async_handle_22(reader, writer, addr, honeypot_server):
+    start_time = datetime.now()
+    honeypot_server.log_connection_start(addr, 22)
+    try:
+        writer.write(FAKE_BANNER.encode())
+        await writer.drain()
+        honeypot_server.honeypot_logger.debug("SSH banner sent to %s", addr)
+
+        data = await asyncio.wait_for(reader.read(1024), honeypot_server.handler_timeout)
+        if data:
+            honeypot_server.capture_payload(addr, data)
+        else:
+            honeypot_server.honeypot_logger.info("No data received from %s", addr)
     except Exception as e:
-        honeypot_server.security_logger.error(f"Error handling SSH connection from {addr}: {e}")
+        honeypot_server.security_logger.error("Error handling SSH connection from %s: %s", addr, e)
     finally:
-        honeypot_server.selector.unregister(conn)
-        conn.close()
+        writer.close()
         honeypot_server.log_connection_end(addr, start_time)
@@ -1,23 +1,29 @@
 import logging
-from datetime import datetime
+from line_protocol import CRLF, LineProtocol, serve_async, serve_blocking
+
+logger = logging.getLogger(__name__)
+
+BANNER = b'Welcome to the Telnet honeypot' + CRLF
+GOODBYE = b'Goodbye!' + CRLF
+ECHO_PREFIX = b'Received: '
+
+
+class TelnetSession(LineProtocol):
+    """Echoes every line back until the client types exit."""
+    banner = BANNER
+
+    def line_received(self, line):
+        command = line.strip()
+        self.command_received(command.partition(b' ')[0])
+        if command.lower() == b'exit':
+            self.closed = True
+            return GOODBYE
+        return ECHO_PREFIX + command + CRLF
+
 
 def handle_23(conn, addr, honeypot_server):
-    start_time = datetime.now()
-    honeypot_server.log_connection_start(addr, 23)
-    try:
-        welcome_message = "Welcome to the Telnet honeypot\n"
-        conn.sendall(welcome_message.encode())
-        while True:
-            command = conn.recv(1024).decode().strip()
-            logging.debug(f"Telnet command from {addr}: {command}")
-            if command.lower() == 'exit':
-                conn.sendall("Goodbye!\n".encode())
-                break
-            else:
-                conn.sendall(f"Received: {command}\n".encode())
-                honeypot_server.capture_payload(addr, command.encode())
-    except Exception as e:
-        logging.error(f"Error handling Telnet connection from {addr}: {e}")
-    finally:
-        conn.close()
-        honeypot_server.log_connection_end(addr, start_time)
+    serve_blocking(TelnetSession(), conn, addr, honeypot_server, 23, logger)
+
+
+async def async_handle_23(reader, writer, addr, honeypot_server):
+    await serve_async(TelnetSession(), reader, writer, addr, honeypot_server, 23, logger)
@@ -1,33 +1,51 @@
 import logging
-from datetime import datetime
+from line_protocol import CRLF, LineProtocol, serve_async, serve_blocking
+
+logger = logging.getLogger(__name__)
+
+BANNER = b'220 Welcome to the SMTP honeypot' + CRLF
+HELLO = b'250 Hello' + CRLF
+OK = b'250 OK' + CRLF
+START_DATA = b'354 End data with <CR><LF>.<CR><LF>' + CRLF
+BYE = b'221 Bye' + CRLF
+
+
+class SmtpSession(LineProtocol):
+    """SMTP dialogue; after DATA, lines are message body until a lone '.'."""
+    banner = BANNER
+
+    def __init__(self):
+        super().__init__()
+        self.in_data = False
+
+    def line_received(self, line):
+        if self.in_data:
+            if line == b'.':
+                self.in_data = False
+                return OK
+            return None
+        return super().line_received(line)
+
+    def hello(self, argument):
+        return HELLO
+
+    def ok(self, argument):
+        return OK
+
+    def data(self, argument):
+        self.in_data = True
+        return START_DATA
+
+    def quit(self, argument):
+        self.closed = True
+        return BYE
+
+    commands = {b'HELO': hello, b'EHLO': hello, b'MAIL': ok, b'RCPT': ok, b'DATA': data, b'.': ok, b'QUIT': quit}
+
 
 def handle_25(conn, addr, honeypot_server):
-    start_time = datetime.now()
-    honeypot_server.log_connection_start(addr, 25)
-    try:
-        welcome_message = "220 Welcome to the SMTP honeypot\n"
-        conn.sendall(welcome_message.encode())
-        while True:
-            command = conn.recv(1024).decode().strip()
-            logging.debug(f"SMTP command from {addr}: {command}")
-            if command.lower().startswith('helo'):
-                conn.sendall("250 Hello\n".encode())
-            elif command.lower().startswith('mail from:'):
-                conn.sendall("250 OK\n".encode())
-            elif command.lower().startswith('rcpt to:'):
-                conn.sendall("250 OK\n".encode())
-            elif command.lower() == 'data':
-                conn.sendall("354 End data with <CR><LF>.<CR><LF>\n".encode())
-            elif command.lower() == '.':
-                conn.sendall("250 OK\n".encode())
-            elif command.lower() == 'quit':
-                conn.sendall("221 Bye\n".encode())
-                break
-            else:
-                conn.sendall("500 Command not understood\n".encode())
-            honeypot_server.capture_payload(addr, command.encode())
-    except Exception as e:
-        logging.error(f"Error handling SMTP connection from {addr}: {e}")
-    finally:
-        conn.close()
-        honeypot_server.log_connection_end(addr, start_time)
+    serve_blocking(SmtpSession(), conn, addr, honeypot_server, 25, logger)
+
+
+async def async_handle_25(reader, writer, addr, honeypot_server):
+    await serve_async(SmtpSession(), reader, writer, addr, honeypot_server, 25, logger)
@@ -1,20 +1,17 @@
 import logging
-from datetime import datetime
+from http_protocol import HttpProtocol
+from line_protocol import serve_async, serve_blocking
+
+logger = logging.getLogger(__name__)
+
+
+def http_session(addr, server):
+    return HttpProtocol(server.http_site, lambda request: server.record_http_request(addr, 80, request))
+
 
 def handle_80(conn, addr, honeypot_server):
-    start_time = datetime.now()
-    honeypot_server.log_connection_start(addr, 80)
-    try:
-        request = conn.recv(1024).decode()
-        logging.debug(f"HTTP request details: {request}")
-        response = "HTTP/1.1 200 OK\n\nWelcome to the HTTP honeypot"
-        conn.sendall(response.encode())
-        logging.info(f"HTTP response sent to {addr}")
-        honeypot_server.capture_payload(addr, request.encode())
-    except BlockingIOError as e:
-        logging.warning(f"Non-blocking socket operation could not be completed immediately for {addr}: {e}")
-    except Exception as e:
-        logging.error(f"Error handling HTTP connection from {addr}: {e}")
-    finally:
-        conn.close()
-        honeypot_server.log_connection_end(addr, start_time)
+    serve_blocking(http_session(addr, honeypot_server), conn, addr, honeypot_server, 80, logger)
+
+
+async def async_handle_80(reader, writer, addr, honeypot_server):
+    await serve_async(http_session(addr, honeypot_server), reader, writer, addr, honeypot_server, 80, logger)
@@ -0,0 +1,164 @@
+import asyncio
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncEngine:
+    """Asyncio connection engine, an alternative to the selector loop in HoneypotServer.start().
+
+    Ports whose handler module defines ``async_handle_<port>(reader, writer, addr, server)``
+    run as coroutines on the event loop. Ports that only define the classic blocking
+    ``handle_<port>(conn, addr, server)`` are run on a bounded thread pool, so a slow
+    session ties up one worker thread instead of the whole server.
+
+    While the server's ConnectionManager has no room for a port, that port's accept
+    loop waits for a session to finish instead of calling accept(), so new
+    connections queue in the kernel backlog.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.executor = ThreadPoolExecutor(max_workers=server.max_handler_threads,
+                                           thread_name_prefix='honeypot-handler')
+        self.sessions = set()
+        self.listeners = {}
+        self.capacity_freed = None
+        self.loop = None
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve(self):
+        self.capacity_freed = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        try:
+            for port in self.server.listen_ports():
+                try:
+                    self.open_port(port)
+                except Exception as e:
+                    self.server.security_logger.critical(f"Failed to listen on port {port}: {e}")
+                    raise
+            while self.server.running:
+                await asyncio.sleep(max(0, self.server.next_tick - time.monotonic()))
+                self.server.tick()
+            self.server.connection_manager.close_all()
+            accept_tasks = [task for _, task in self.listeners.values()]
+            for task in accept_tasks + list(self.sessions):
+                task.cancel()
+            await asyncio.gather(*accept_tasks, *self.sessions, return_exceptions=True)
+        finally:
+            for sock, _ in self.listeners.values():
+                sock.close()
+            self.listeners.clear()
+
+    def open_port(self, port):
+        """Start listening on a port; called on the event loop."""
+        sock = self.server.create_listener(port)
+        self.listeners[port] = (sock, asyncio.create_task(self.accept_loop(sock, port)))
+        self.server.honeypot_logger.info(f"Listening on port {port}...")
+
+    def close_port(self, port):
+        """Stop accepting on a port; sessions already accepted on it carry on."""
+        listener = self.listeners.pop(port, None)
+        if listener is None:
+            return
+        sock, task = listener
+        task.cancel()
+        # Close only once the pending sock_accept() has been cancelled and stopped watching the fd.
+        task.add_done_callback(lambda task: sock.close())
+        self.server.paused_ports.discard(port)
+
+    async def accept_loop(self, sock, port):
+        loop = asyncio.get_running_loop()
+        connections = self.server.connection_manager
+        while True:
+            if not connections.can_accept(port):
+                self.server.paused_ports.add(port)
+                self.server.honeypot_logger.warning("Paused accepting on port %s: session limit reached", port)
+                while not connections.can_accept(port):
+                    self.capacity_freed.clear()
+                    await self.capacity_freed.wait()
+                self.server.paused_ports.discard(port)
+                self.server.honeypot_logger.info("Resumed accepting on port %s", port)
+            try:
+                conn, addr = await loop.sock_accept(sock)
+            except OSError as e:
+                # Typically EMFILE/ENFILE under a flood; back off instead of spinning.
+                self.server.security_logger.error(f"Error accepting connection on port {port}: {e}")
+                await asyncio.sleep(0.1)
+                continue
+            self.server.record_accept(addr, port)
+            if not self.server.admit_connection(conn, addr, port):
+                continue
+            service = self.server.raw_services.get(port)
+            if service:
+                self.server.hand_off(service, conn, addr, port)
+                continue
+            task = asyncio.create_task(self.handle_connection(conn, addr, port))
+            self.sessions.add(task)
+            task.add_done_callback(self.sessions.discard)
+            connections.register(addr, port, lambda task=task, conn=conn: self.close_session(task, conn, port))
+
+    def call_soon_threadsafe(self, callback):
+        """Run callback on the event loop from another thread; dropped once the loop has shut down."""
+        try:
+            self.loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass
+
+    def close_session(self, task, conn, port):
+        """Reaper callback: cancel a coroutine session, or unblock the thread running a blocking one."""
+        if port in self.server.async_services:
+            task.cancel()
+            return
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    async def handle_connection(self, conn, addr, port):
+        try:
+            async_handler = self.server.async_services.get(port)
+            if async_handler:
+                await self.run_async_handler(async_handler, conn, addr, port)
+                return
+            handler = self.server.services.get(port)
+            if handler:
+                await self.run_blocking_handler(handler, conn, addr, port)
+                return
+            self.server.honeypot_logger.warning(f"No handler for port {port}. Closing connection from {addr}.")
+            conn.close()
+        finally:
+            self.server.end_session(addr)
+            self.capacity_freed.set()
+
+    async def run_async_handler(self, handler, conn, addr, port):
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection(sock=conn)
+            await handler(*self.server.record_streams(reader, writer, addr, port), addr, self.server)
+        except Exception as e:
+            self.server.security_logger.error(f"Error handling connection from {addr}: {e}")
+            self.server.honeypot_logger.error(f"Error handling connection from {addr}: {e}")
+        finally:
+            if writer:
+                writer.close()
+            else:
+                conn.close()
+
+    async def run_blocking_handler(self, handler, conn, addr, port):
+        """Compatibility shim for handle_<port>(conn, addr, server) handlers."""
+        conn.setblocking(True)
+        conn.settimeout(self.server.handler_timeout)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, handler, self.server.record_session(conn, addr, port), addr,
+                                       self.server)
+        except Exception as e:
+            self.server.security_logger.error(f"Error handling connection from {addr}: {e}")
+            self.server.honeypot_logger.error(f"Error handling connection from {addr}: {e}")
+            conn.close()
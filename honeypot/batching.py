@@ -0,0 +1,90 @@
+import queue
+import threading
+
+_STOP = object()
+
+
+class BatchWriter:
+    """Background thread that drains a bounded queue and commits items in groups.
+
+    Producers call submit() from the accept/handler path and never wait on disk I/O;
+    subclasses implement write_batch() and run it on the writer thread. When the queue
+    is full, items are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, name, logger, queue_size=10000, batch_size=256, flush_interval=0.5):
+        self.name = name
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                self.logger.warning(f"{self.name} queue full, {self.dropped} items dropped so far")
+            return False
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been written."""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        self.on_start()
+        stopping = False
+        while not stopping:
+            batch = []
+            waiters = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    self.logger.error(f"{self.name} failed to write batch of {len(batch)} items: {e}")
+            for waiter in waiters:
+                waiter.set()
+        self.on_close()
+
+    def write_batch(self, items):
+        raise NotImplementedError
+
+    def on_start(self):
+        """Acquire resources on the writer thread before the first batch."""
+
+    def on_close(self):
+        """Release resources on the writer thread once the queue has been drained."""
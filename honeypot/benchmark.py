@@ -0,0 +1,233 @@
+"""Load-generation benchmark for HoneypotServer.
+
+Starts the honeypot on loopback (ports shifted by --port-offset so no privileges are
+needed), drives concurrent synthetic clients through a short scripted dialogue per
+protocol, and prints machine-readable JSON results:
+
+    python honeypot/benchmark.py --engine asyncio --duration 10 --concurrency 200
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+# Each dialogue is a list of (bytes to send, expect a reply). A leading None means
+# the server speaks first and we wait for its banner before sending anything.
+DIALOGUES = {
+    21: [None, (b'USER anonymous\r\n', True), (b'PASS guest@\r\n', True), (b'SYST\r\n', True), (b'QUIT\r\n', True)],
+    22: [None, (b'SSH-2.0-OpenSSH_8.9p1 bench\r\n', False)],
+    23: [None, (b'uname -a\r\n', True), (b'exit\r\n', True)],
+    25: [None, (b'HELO bench.example\r\n', True), (b'MAIL FROM:<a@bench.example>\r\n', True),
+         (b'RCPT TO:<b@bench.example>\r\n', True), (b'QUIT\r\n', True)],
+    80: [(b'GET / HTTP/1.1\r\nHost: bench\r\nUser-Agent: honeypot-bench\r\n\r\n', True)],
+    110: [None, (b'USER bench\r\n', True), (b'PASS bench\r\n', True), (b'STAT\r\n', True), (b'QUIT\r\n', True)],
+}
+
+
+class PortResult:
+    def __init__(self):
+        self.attempts = 0
+        self.connected = 0
+        self.completed = 0
+        self.errors = {}
+        self.time_to_banner = []
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self, duration):
+        return {
+            'attempts': self.attempts,
+            'accepts_per_sec': round(self.connected / duration, 2),
+            'completed': self.completed,
+            'completion_rate': round(self.completed / self.attempts, 4) if self.attempts else None,
+            'time_to_banner_ms': {
+                'p50': percentile(self.time_to_banner, 50),
+                'p99': percentile(self.time_to_banner, 99),
+            },
+            'errors': self.errors,
+        }
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index] * 1000, 3)
+
+
+async def run_session(host, port, dialogue, result, timeout):
+    result.attempts += 1
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except Exception as e:
+        result.error(type(e).__name__)
+        return
+    result.connected += 1
+    try:
+        first_reply = True
+        for step in dialogue:
+            if step is None:
+                expect_reply = True
+            else:
+                payload, expect_reply = step
+                writer.write(payload)
+                await writer.drain()
+            if expect_reply:
+                reply = await asyncio.wait_for(reader.read(4096), timeout)
+                if not reply:
+                    raise ConnectionResetError('closed before reply')
+                if first_reply:
+                    result.time_to_banner.append(time.perf_counter() - started)
+                    first_reply = False
+        result.completed += 1
+    except Exception as e:
+        result.error(type(e).__name__)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+
+async def client_loop(host, ports, port_offset, results, deadline, timeout, worker):
+    index = worker
+    while time.monotonic() < deadline:
+        port = ports[index % len(ports)]
+        index += 1
+        await run_session(host, port + port_offset, DIALOGUES[port], results[port], timeout)
+
+
+async def drive(host, ports, port_offset, concurrency, duration, timeout):
+    results = {port: PortResult() for port in ports}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client_loop(host, ports, port_offset, results, deadline, timeout, worker)
+                           for worker in range(concurrency)))
+    return results
+
+
+async def wait_until_listening(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def count_captures(capture_root):
+    captures = 0
+    for path in glob.glob(os.path.join(capture_root, 'sessions', '*.jsonl')):
+        with open(path) as f:
+            captures += sum(1 for line in f if '"type":"capture"' in line or '"type":"transcript"' in line)
+    return captures
+
+
+def build_config(args, workdir):
+    config = {
+        'host': args.host,
+        'ports': args.ports,
+        'port_offset': args.port_offset,
+        'engine': args.engine,
+        'workers': args.workers,
+        'allowed_networks': ['0.0.0.0/0', '::/0'],
+        'rate_limit': {'threshold': 10 ** 9, 'window': 1},
+        'connections': {'per_ip': 0},
+        'capture_root': 'captures',
+        'metadata_sink': {'type': 'jsonl'},
+        'logging': {'directory': 'logs', 'level': 'WARNING', 'console': False,
+                    'loggers': {'honeypot': 'WARNING', 'security': 'ERROR', 'handlers': 'WARNING'}},
+    }
+    config.update(json.loads(args.extra_config))
+    path = os.path.join(workdir, 'benchmark_config.json')
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ports', type=int, nargs='+', default=sorted(DIALOGUES))
+    parser.add_argument('--port-offset', type=int, default=20000)
+    parser.add_argument('--engine', choices=['selector', 'asyncio'], default='asyncio')
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=50, help='number of concurrent client loops')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load')
+    parser.add_argument('--timeout', type=float, default=5.0, help='per-step client timeout')
+    parser.add_argument('--extra-config', default='{}', help='JSON merged into the generated server config')
+    parser.add_argument('--output', help='write results here instead of stdout')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary capture/log directory')
+    args = parser.parse_args(argv)
+    unknown = set(args.ports) - set(DIALOGUES)
+    if unknown:
+        parser.error(f"no client dialogue for ports {sorted(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='honeypot-bench-')
+    config_path = build_config(args, workdir)
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'honeypot.py'),
+                               config_path])
+    try:
+        asyncio.run(wait_until_listening(args.host, args.ports[0] + args.port_offset, timeout=15))
+        started = time.perf_counter()
+        results = asyncio.run(drive(args.host, args.ports, args.port_offset, args.concurrency, args.duration,
+                                    args.timeout))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    per_port = {str(port): result.summary(elapsed) for port, result in results.items()}
+    attempts = sum(result.attempts for result in results.values())
+    captures = count_captures(os.path.join(workdir, 'captures'))
+    report = {
+        'engine': args.engine,
+        'workers': args.workers,
+        'concurrency': args.concurrency,
+        'duration_sec': round(elapsed, 3),
+        'totals': {
+            'attempts': attempts,
+            'accepts_per_sec': round(sum(result.connected for result in results.values()) / elapsed, 2),
+            'completion_rate': round(sum(result.completed for result in results.values()) / attempts, 4)
+            if attempts else None,
+            'time_to_banner_ms': {
+                'p50': percentile([t for result in results.values() for t in result.time_to_banner], 50),
+                'p99': percentile([t for result in results.values() for t in result.time_to_banner], 99),
+            },
+            'captures': captures,
+            'captures_per_sec': round(captures / elapsed, 2),
+        },
+        'ports': per_port,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.keep:
+        print(f"Kept benchmark files in {workdir}", file=sys.stderr)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import ipaddress
+import os
+import threading
+import time
+
+ALLOW = 'allow'
+DENY = 'deny'
+
+# Trie node layout: [child for bit 0, child for bit 1, value]
+_VALUE = 2
+
+
+class CidrIndex:
+    """Binary prefix trie answering longest-prefix-match lookups in O(prefix length).
+
+    IPv4 and IPv6 prefixes live in separate tries; IPv4-mapped IPv6 addresses are
+    looked up as IPv4.
+    """
+
+    def __init__(self):
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        self.size = 0
+
+    def insert(self, network, value):
+        network = ipaddress.ip_network(network, strict=False)
+        node = self.roots[network.version]
+        bits = network.max_prefixlen
+        address = int(network.network_address)
+        for depth in range(network.prefixlen):
+            bit = (address >> (bits - 1 - depth)) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None, None]
+            node = child
+        if node[_VALUE] is None:
+            self.size += 1
+        # On an exact duplicate, a deny entry beats an allow entry.
+        if node[_VALUE] != DENY:
+            node[_VALUE] = value
+
+    def lookup(self, ip):
+        """Return the value of the most specific prefix containing ip, or None."""
+        address = ipaddress.ip_address(ip)
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        node = self.roots[address.version]
+        bits = address.max_prefixlen
+        value = int(address)
+        best = node[_VALUE]
+        for depth in range(bits):
+            node = node[(value >> (bits - 1 - depth)) & 1]
+            if node is None:
+                break
+            if node[_VALUE] is not None:
+                best = node[_VALUE]
+        return best
+
+    def __len__(self):
+        return self.size
+
+
+def read_network_list(path, logger=None):
+    """Yield the prefixes in a list file: one CIDR or address per line, '#' starts a comment.
+
+    Invalid entries are logged and skipped, so one typo does not take down the whole list.
+    """
+    with open(path) as list_file:
+        for line_number, line in enumerate(list_file, 1):
+            entry = line.split('#', 1)[0].strip()
+            if not entry:
+                continue
+            try:
+                yield ipaddress.ip_network(entry, strict=False)
+            except ValueError as e:
+                if logger:
+                    logger.warning("Skipping invalid network list entry %s:%d: %s", path, line_number, e)
+
+
+class NetworkPolicy:
+    """Allow/deny decision for source addresses, backed by a CidrIndex.
+
+    The most specific matching prefix decides; addresses matching no allow prefix
+    are refused. List files are re-read when their modification time changes and
+    the new index is built on a background thread and replaces the old one in a
+    single assignment, so lookups never wait for or see a half-built index.
+    """
+
+    def __init__(self, allowed_networks, denied_networks=(), allow_files=(), deny_files=(),
+                 reload_interval=30, logger=None):
+        self.allowed_networks = list(allowed_networks)
+        self.denied_networks = list(denied_networks)
+        self.allow_files = list(allow_files)
+        self.deny_files = list(deny_files)
+        self.reload_interval = reload_interval
+        self.logger = logger
+        self.mtimes = {}
+        self.last_check = time.monotonic()
+        self.rebuilding = None
+        self.index = self.build()
+
+    def file_mtimes(self):
+        mtimes = {}
+        for path in self.allow_files + self.deny_files:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def build(self):
+        mtimes = self.file_mtimes()
+        index = CidrIndex()
+        for network in self.allowed_networks:
+            index.insert(network, ALLOW)
+        for network in self.denied_networks:
+            index.insert(network, DENY)
+        for paths, value in ((self.allow_files, ALLOW), (self.deny_files, DENY)):
+            for path in paths:
+                for network in read_network_list(path, self.logger):
+                    index.insert(network, value)
+        self.mtimes = mtimes
+        if self.logger:
+            self.logger.info(f"Built network allow/deny index with {len(index)} prefixes")
+        return index
+
+    def is_allowed(self, ip):
+        return self.index.lookup(ip) == ALLOW
+
+    def refresh(self):
+        """Start a rebuild if a list file changed; call periodically from the server tick."""
+        now = time.monotonic()
+        if not (self.allow_files or self.deny_files) or now - self.last_check < self.reload_interval:
+            return False
+        self.last_check = now
+        if (self.rebuilding and self.rebuilding.is_alive()) or self.file_mtimes() == self.mtimes:
+            return False
+        self.rebuilding = threading.Thread(target=self.rebuild, name='network-index-rebuild', daemon=True)
+        self.rebuilding.start()
+        return True
+
+    def rebuild(self):
+        try:
+            self.index = self.build()
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Failed to rebuild network allow/deny index, keeping the previous one: {e}")
@@ -0,0 +1,148 @@
+import time
+
+from timer_wheel import TimerWheel
+
+GLOBAL_LIMIT = 'max_sessions'
+PORT_LIMIT = 'port_limit'
+IP_LIMIT = 'ip_limit'
+
+
+class Session:
+    __slots__ = ('addr', 'port', 'started', 'last_active', 'close', 'closing', 'idle_timer', 'lifetime_timer')
+
+    def __init__(self, addr, port, started, close):
+        self.addr = addr
+        self.port = port
+        self.started = started
+        self.last_active = started
+        self.close = close
+        self.closing = None
+        self.idle_timer = None
+        self.lifetime_timer = None
+
+
+class ConnectionManager:
+    """Session budget and reaper shared by both connection engines.
+
+    Caps concurrent sessions globally (``max_sessions``), per listening port
+    (``per_port``) and per source address (``per_ip``). Engines stop accepting on a
+    port while can_accept() is false, leaving new connections in the kernel backlog
+    instead of running out of file descriptors. Sessions that have been idle for
+    ``idle_timeout`` seconds or open for ``max_lifetime`` seconds are closed through
+    the close callback given to register(); timers live on a TimerWheel advanced by
+    reap(), and touch() only stamps the session, the idle timer re-arming itself
+    lazily when it fires. Call everything except touch() from the engine thread.
+    """
+
+    def __init__(self, max_sessions=10000, per_ip=64, per_port=None, idle_timeout=120, max_lifetime=900,
+                 resolution=1.0, logger=None, on_reap=None):
+        self.configure(max_sessions, per_ip, per_port, idle_timeout, max_lifetime)
+        self.logger = logger
+        self.on_reap = on_reap
+        self.wheel = TimerWheel(resolution, now=time.monotonic())
+        self.sessions = {}
+        self.port_counts = {}
+        self.ip_counts = {}
+        self.now = time.monotonic()
+
+    def configure(self, max_sessions=10000, per_ip=64, per_port=None, idle_timeout=120, max_lifetime=900):
+        """Set the limits; open sessions keep their slots and already scheduled deadlines."""
+        self.max_sessions = max_sessions
+        self.per_ip = per_ip
+        self.per_port = {int(port): limit for port, limit in (per_port or {}).items()}
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+
+    def can_accept(self, port):
+        if len(self.sessions) >= self.max_sessions:
+            return False
+        limit = self.per_port.get(port)
+        return limit is None or self.port_counts.get(port, 0) < limit
+
+    def refusal_reason(self, ip, port):
+        """Return why a new session from ip on port would exceed a limit, or None."""
+        if len(self.sessions) >= self.max_sessions:
+            return GLOBAL_LIMIT
+        limit = self.per_port.get(port)
+        if limit is not None and self.port_counts.get(port, 0) >= limit:
+            return PORT_LIMIT
+        if self.per_ip and self.ip_counts.get(ip, 0) >= self.per_ip:
+            return IP_LIMIT
+        return None
+
+    def register(self, addr, port, close):
+        now = time.monotonic()
+        session = Session(addr, port, now, close)
+        self.sessions[addr] = session
+        self.port_counts[port] = self.port_counts.get(port, 0) + 1
+        self.ip_counts[addr[0]] = self.ip_counts.get(addr[0], 0) + 1
+        if self.idle_timeout:
+            session.idle_timer = self.wheel.schedule(now + self.idle_timeout, lambda: self.check_idle(session))
+        if self.max_lifetime:
+            session.lifetime_timer = self.wheel.schedule(now + self.max_lifetime,
+                                                         lambda: self.expire(session, 'lifetime'))
+        return session
+
+    def touch(self, addr):
+        session = self.sessions.get(addr)
+        if session is not None:
+            session.last_active = time.monotonic()
+
+    def release(self, addr):
+        session = self.sessions.pop(addr, None)
+        if session is None:
+            return
+        for timer in (session.idle_timer, session.lifetime_timer):
+            if timer is not None:
+                timer.cancel()
+        self.decrement(self.port_counts, session.port)
+        self.decrement(self.ip_counts, addr[0])
+
+    @staticmethod
+    def decrement(counts, key):
+        remaining = counts.get(key, 0) - 1
+        if remaining > 0:
+            counts[key] = remaining
+        else:
+            counts.pop(key, None)
+
+    def reap(self, now=None):
+        """Close sessions whose idle or lifetime deadline has passed; call from the engine tick."""
+        self.now = time.monotonic() if now is None else now
+        return self.wheel.advance(self.now)
+
+    def check_idle(self, session):
+        if not self.idle_timeout:
+            return
+        deadline = session.last_active + self.idle_timeout
+        if deadline > self.now:
+            session.idle_timer = self.wheel.schedule(deadline, lambda: self.check_idle(session))
+            return
+        self.expire(session, 'idle')
+
+    def expire(self, session, reason):
+        if session.closing or self.sessions.get(session.addr) is not session:
+            return
+        session.closing = reason
+        if self.logger:
+            self.logger.warning("Closing %s session from %s on port %s after %.0f seconds",
+                                reason, session.addr, session.port, self.now - session.started)
+        if self.on_reap:
+            self.on_reap(session, reason)
+        try:
+            session.close()
+        except Exception as e:
+            if self.logger:
+                self.logger.error("Error closing reaped session from %s: %s", session.addr, e)
+
+    def close_all(self):
+        """Close every open session, e.g. so blocked handler threads return at shutdown."""
+        for session in list(self.sessions.values()):
+            try:
+                session.close()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Error closing session from %s: %s", session.addr, e)
+
+    def __len__(self):
+        return len(self.sessions)
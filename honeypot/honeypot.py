@@ -1,239 +1,867 @@
 import socket
 import logging
-import time
 from datetime import datetime
 import json
 import os
-import hashlib
 import importlib.util
 import selectors
-import ipaddress
-import re
-
-# Set up logging
-log_path = os.path.join(os.path.dirname(__file__), '../logs/honeypot.log')
-security_log_path = os.path.join(os.path.dirname(__file__), '../logs/security_warning.log')
-os.makedirs(os.path.dirname(log_path), exist_ok=True)
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+import signal
+import sys
+import threading
+import time
+import errno
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from async_engine import AsyncEngine
+from supervisor import Supervisor
+from payload_store import PayloadStore
+from metadata_sink import create_metadata_sink
+from logging_setup import configure_logging
+from signatures import DEFAULT_RULES, RuleSet, SignatureEngine
+from rate_limiter import RateLimiter
+from cidr_index import NetworkPolicy
+from connection_manager import ConnectionManager
+from session_recorder import RecordingReader, RecordingSocket, RecordingWriter, SessionRecorder
+from profiler import AttackerProfiler
+from ssh_emulation import SSH_AVAILABLE, SshEmulator, load_host_key
+from http_protocol import HttpSite
+from tarpit import Tarpit
+from metrics import DEFAULT_LAG_BUCKETS, DEFAULT_SIZE_BUCKETS, MetricsRegistry, MetricsServer
+
+# Outputs, levels and rotation are configured from the 'logging' config section in load_config()
+log_dir = os.path.join(os.path.dirname(__file__), '../logs')
 honeypot_logger = logging.getLogger('honeypot')
-honeypot_logger.addHandler(logging.FileHandler(log_path))
 security_logger = logging.getLogger('security')
-security_logger.addHandler(logging.FileHandler(security_log_path))
+
+# Settings that are only read at startup; reload() warns when they change.
+RESTART_KEYS = ('workers', 'logging', 'host', 'port_offset', 'capture_root', 'engine', 'max_handler_threads',
+                'listen_backlog', 'reuse_port', 'tick_interval', 'metrics', 'payload_store', 'metadata_sink',
+                'session_recorder', 'profiling', 'ssh_emulation', 'tarpit', 'supervisor')
 
 class HoneypotServer:
     def __init__(self, honeypot_logger, security_logger, config_path='../cfg/honeypot_config.json'):
         self.honeypot_logger = honeypot_logger
         self.security_logger = security_logger
         config_path = os.path.join(os.path.dirname(__file__), config_path)
+        self.signature_engine = None
         self.load_config(config_path)
-        self.services = self.load_handlers()
+        self.handler_mtimes = {}
+        self.services, self.async_services = self.load_handlers()
+        self.watched_mtimes = self.watched_files()
+        self.next_watch_check = 0
+        self.reload_requested = False
         self.selector = selectors.DefaultSelector()
-        self.rate_limit = {}
-        self.rate_limit_window = 60
-        self.rate_limit_threshold = 100
-        self.suspicious_patterns = [
-            re.compile(b'\x90{100,}'),  # NOP sleds
-            re.compile(b'cmd.exe'),  # Command execution
-            re.compile(b'/bin/sh'),  # Shell execution
-            re.compile(b'rootkit'),  # Rootkit signatures
-        ]
+        self.listeners = {}
+        self.paused_ports = set()
+        self.accept_backoff_until = 0
+        self.raw_services = {}
+        self.finished_handoffs = deque()
+        self.handler_executor = None
+        self.wakeup_reader = None
+        self.wakeup_writer = None
+        self.running = False
+        self.worker_id = None
+        self.stats_channel = None
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.last_reported_stats = None
+        self.payload_store = None
+        self.metadata_sink = None
+        self.session_recorder = None
+        self.profiler = None
+        self.tarpit = None
+        self.session_ports = {}
+        self.async_engine = None
+        self.metrics_server = None
+        self.next_tick = None
+        self.init_metrics()
 
     def load_config(self, config_path):
         try:
             with open(config_path) as config_file:
                 config = json.load(config_file)
+            self.config_path = config_path
+            self.workers = config.get('workers', 0)
+            self.supervisor_options = config.get('supervisor', {})
+            config_dir = os.path.dirname(config_path)
+            logging_options = dict(config.get('logging', {}))
+            logging_dir = os.path.join(config_dir, logging_options.pop('directory')) if 'directory' in logging_options else log_dir
+            configure_logging(logging_options, logging_dir, multiprocess=self.workers > 1)
             self.host = config.get('host', '0.0.0.0')
-            self.ports = config.get('ports', [80, 21, 22, 23, 25, 110])
-            self.payload_storage_path = os.path.join(os.path.dirname(__file__), 'captures/payloads/')
-            self.session_metadata_path = os.path.join(os.path.dirname(__file__), 'captures/sessions/')
-            self.allowed_networks = [ipaddress.ip_network(net) for net in config.get('allowed_networks', ['0.0.0.0/0'])]
+            self.port_offset = config.get('port_offset', 0)
+            capture_root = os.path.join(os.path.dirname(__file__), 'captures')
+            if 'capture_root' in config:
+                capture_root = os.path.join(config_dir, config['capture_root'])
+            self.payload_storage_path = os.path.join(capture_root, 'payloads/')
+            self.session_metadata_path = os.path.join(capture_root, 'sessions/')
+            self.profile_path = os.path.join(capture_root, 'profiles/')
+            # Every shipped handler has an async variant; 'selector' parks a pool thread per blocking session.
+            self.engine = config.get('engine', 'asyncio')
+            self.max_handler_threads = config.get('max_handler_threads', 64)
+            self.listen_backlog = config.get('listen_backlog', 1024)
+            self.reuse_port = config.get('reuse_port', self.workers > 1)
+            self.tick_interval = config.get('tick_interval', 1.0)
+            self.metrics_options = config.get('metrics', {})
+            self.payload_store_options = config.get('payload_store', {})
+            self.metadata_sink_options = config.get('metadata_sink', {})
+            self.session_recorder_options = dict(config.get('session_recorder', {}))
+            self.profiling_options = dict(config.get('profiling', {}))
+            self.tarpit_options = dict(config.get('tarpit', {}))
+            self.load_ssh_options(config.get('ssh_emulation', {}), config_dir, capture_root)
+            self.signature_options = dict(config.get('signatures', {}))
+            self.signature_options.pop('rules_path', None)
+            reload_options = config.get('reload', {})
+            self.watch_files = reload_options.get('watch', True)
+            self.watch_interval = reload_options.get('interval', 5)
+            self.connection_manager = ConnectionManager(
+                resolution=config.get('connections', {}).get('resolution', 1.0),
+                logger=self.honeypot_logger, on_reap=self.record_reap)
+            self.network_policy = None
+            self.rate_limiter = None
+            self.applied_config = {}
+            self.apply_config(config)
             os.makedirs(self.payload_storage_path, exist_ok=True)
             os.makedirs(self.session_metadata_path, exist_ok=True)
+            os.makedirs(self.profile_path, exist_ok=True)
         except Exception as e:
             self.security_logger.error(f"Failed to load configuration: {e}")
             raise
 
-    def load_handlers(self):
+    def load_ssh_options(self, options, config_dir, capture_root):
+        """Load the SSH host key once, before any worker is forked, if SSH emulation is enabled."""
+        self.ssh_options = dict(options)
+        self.ssh_port = self.ssh_options.pop('port', 22)
+        self.ssh_host_key = None
+        if not self.ssh_options.pop('enabled', False):
+            return
+        if not SSH_AVAILABLE:
+            self.security_logger.warning("SSH emulation needs paramiko; serving port %s in banner mode", self.ssh_port)
+            self.honeypot_logger.warning("SSH emulation needs paramiko; serving port %s in banner mode", self.ssh_port)
+            return
+        host_key = self.ssh_options.pop('host_key', None)
+        host_key = os.path.join(config_dir, host_key) if host_key else os.path.join(capture_root, 'ssh_host_rsa_key')
+        self.ssh_host_key = load_host_key(host_key, self.honeypot_logger)
+
+    def apply_config(self, config):
+        """Build the settings that may change at runtime, then swap each one in with a single assignment.
+
+        Everything is built before anything is assigned, so a broken section leaves the
+        running configuration untouched. Unchanged sections keep their existing objects,
+        so a reload does not reset rate-limit buckets or rebuild the network index.
+        """
+        config_dir = os.path.dirname(self.config_path)
+        previous = self.applied_config
+
+        def changed(*keys):
+            return not previous or any(config.get(key) != previous.get(key) for key in keys)
+
+        network_policy = self.network_policy
+        if changed('allowed_networks', 'denied_networks', 'network_lists'):
+            network_lists = config.get('network_lists', {})
+            network_policy = NetworkPolicy(
+                config.get('allowed_networks', ['0.0.0.0/0']),
+                config.get('denied_networks', []),
+                allow_files=[os.path.join(config_dir, path) for path in network_lists.get('allow_files', [])],
+                deny_files=[os.path.join(config_dir, path) for path in network_lists.get('deny_files', [])],
+                reload_interval=network_lists.get('reload_interval', 30),
+                logger=self.honeypot_logger,
+            )
+        rate_limiter = self.rate_limiter
+        if changed('rate_limit'):
+            rate_limiter = RateLimiter(**config.get('rate_limit', {}))
+        rules_path = config.get('signatures', {}).get('rules_path')
+        rules_path = os.path.join(config_dir, rules_path) if rules_path else None
+        rule_set = RuleSet.from_file(rules_path) if rules_path else RuleSet(DEFAULT_RULES)
+        connection_options = dict(config.get('connections', {}))
+        connection_options.pop('resolution', None)
+        http_site = HttpSite(**config.get('http', {}))
+
+        self.connection_manager.configure(**connection_options)
+        self.network_policy = network_policy
+        self.rate_limiter = rate_limiter
+        self.rules_path = rules_path
+        self.rule_set = rule_set
+        if self.signature_engine:
+            self.signature_engine.rule_set = rule_set
+        self.http_site = http_site
+        self.ports = config.get('ports', [80, 21, 22, 23, 25, 110])
+        self.handler_timeout = config.get('handler_timeout', 30)
+        self.stats_interval = config.get('stats_interval', 10)
+        self.applied_config = config
+        self.honeypot_logger.info(f"Loaded {len(self.rule_set)} payload signatures")
+
+    def handler_path(self, port):
+        return os.path.join(os.path.dirname(__file__), '../handlers', f"{port}.py")
+
+    def load_handlers(self, reuse=False):
+        """Import handlers/<port>.py for each configured port.
+
+        With reuse, modules whose file has not changed since the last load are kept
+        as they are, and a module that fails to import keeps its previous version.
+        """
         handlers = {}
-        handler_dir = os.path.join(os.path.dirname(__file__), '../handlers')
-        
+        async_handlers = {}
+        mtimes = {}
+
         for port in self.ports:
             module_name = f"handlers.{port}"
-            handler_path = os.path.join(handler_dir, f"{port}.py")
-            
+            handler_path = self.handler_path(port)
+
             if os.path.isfile(handler_path):
+                mtime = os.stat(handler_path).st_mtime_ns
+                if reuse and self.handler_mtimes.get(port) == mtime:
+                    self.keep_handler(port, handlers, async_handlers, mtimes)
+                    continue
                 self.honeypot_logger.debug(f"Found handler file for port {port} at {handler_path}")
                 spec = importlib.util.spec_from_file_location(module_name, handler_path)
                 module = importlib.util.module_from_spec(spec)
                 try:
                     spec.loader.exec_module(module)
                     handler_func = getattr(module, f"handle_{port}", None)
+                    async_handler_func = getattr(module, f"async_handle_{port}", None)
                     if handler_func:
                         handlers[port] = handler_func
                         self.honeypot_logger.info(f"Loaded handler for port {port}")
-                    else:
+                    if async_handler_func:
+                        async_handlers[port] = async_handler_func
+                        self.honeypot_logger.info(f"Loaded async handler for port {port}")
+                    if not handler_func and not async_handler_func:
                         self.honeypot_logger.warning(f"No handler function found in {handler_path}")
+                    mtimes[port] = mtime
                 except Exception as e:
                     self.security_logger.error(f"Failed to load handler for port {port}: {e}")
+                    if reuse:
+                        self.keep_handler(port, handlers, async_handlers, mtimes)
             else:
                 self.honeypot_logger.warning(f"No handler file found for port {port}")
-        
-        return handlers
+
+        self.handler_mtimes = mtimes
+        return handlers, async_handlers
+
+    def keep_handler(self, port, handlers, async_handlers, mtimes):
+        if port in self.services:
+            handlers[port] = self.services[port]
+        if port in self.async_services:
+            async_handlers[port] = self.async_services[port]
+        if port in self.handler_mtimes:
+            mtimes[port] = self.handler_mtimes[port]
+
+    def watched_files(self):
+        paths = [self.config_path] + [self.handler_path(port) for port in self.ports]
+        if self.rules_path:
+            paths.append(self.rules_path)
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def request_reload(self):
+        """Reload configuration and handlers at the next tick; safe to call from a signal handler."""
+        self.reload_requested = True
+
+    def reload(self):
+        """Re-read the config file and changed handler modules without dropping live sessions.
+
+        Sessions already running finish on the handler function they started with; new
+        connections get the reloaded one. Listeners are opened and closed only for
+        ports that were added or removed.
+        """
+        self.reload_requested = False
+        old_ports = self.listen_ports()
+        try:
+            with open(self.config_path) as config_file:
+                config = json.load(config_file)
+            restart_keys = [key for key in RESTART_KEYS if config.get(key) != self.applied_config.get(key)]
+            self.apply_config(config)
+            self.services, self.async_services = self.load_handlers(reuse=True)
+        except Exception as e:
+            self.security_logger.error(f"Failed to reload configuration, keeping the running one: {e}")
+            self.honeypot_logger.error(f"Failed to reload configuration, keeping the running one: {e}")
+            return False
+        finally:
+            self.watched_mtimes = self.watched_files()
+        if restart_keys:
+            self.honeypot_logger.warning(f"Changes to {', '.join(restart_keys)} take effect after a restart")
+        if self.running:
+            self.update_listeners(old_ports)
+        self.honeypot_logger.info(f"Reloaded configuration from {self.config_path}")
+        return True
+
+    def files_changed(self):
+        self.next_watch_check = time.monotonic() + self.watch_interval
+        return self.watched_files() != self.watched_mtimes
+
+    def listen_ports(self):
+        """The configured ports plus the tarpit's, which need no entry in 'ports' or handler file."""
+        tarpit_ports = self.tarpit.modes if self.tarpit else ()
+        return list(self.ports) + [port for port in tarpit_ports if port not in self.ports]
+
+    def update_listeners(self, old_ports):
+        """Close listeners for ports dropped from the config and open the new ones."""
+        ports = self.listen_ports()
+        for port in old_ports:
+            if port not in ports:
+                if self.async_engine:
+                    self.async_engine.close_port(port)
+                else:
+                    self.close_listener(port)
+                self.honeypot_logger.info(f"Stopped listening on port {port}")
+        for port in ports:
+            if port not in old_ports:
+                try:
+                    if self.async_engine:
+                        self.async_engine.open_port(port)
+                    else:
+                        self.listen_on_port(port)
+                except Exception as e:
+                    self.honeypot_logger.error(f"Failed to open listener for port {port}: {e}")
     
     def start(self):
-        for port in self.ports:
-            self.listen_on_port(port)
-        while True:
-            events = self.selector.select()
-            for key, mask in events:
-                callback = key.data
-                callback(key.fileobj, mask)
+        self.running = True
+        self.start_background()
+        try:
+            self.next_tick = time.monotonic() + self.tick_interval
+            if self.engine == 'asyncio':
+                self.honeypot_logger.info("Starting asyncio connection engine")
+                self.async_engine = AsyncEngine(self)
+                self.async_engine.run()
+                return
+            # Created here rather than reused from __init__ so forked workers never share an epoll instance.
+            self.selector = selectors.DefaultSelector()
+            # Blocking handlers run on a bounded pool; its threads wake the loop to release finished sessions.
+            self.handler_executor = ThreadPoolExecutor(max_workers=self.max_handler_threads,
+                                                       thread_name_prefix='honeypot-handler')
+            self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+            self.wakeup_reader.setblocking(False)
+            self.wakeup_writer.setblocking(False)
+            self.selector.register(self.wakeup_reader, selectors.EVENT_READ, self.drain_wakeups)
+            for port in self.listen_ports():
+                self.listen_on_port(port)
+            while self.running:
+                events = self.selector.select(timeout=max(0, self.next_tick - time.monotonic()))
+                for key, mask in events:
+                    callback = key.data
+                    callback(key.fileobj, mask)
+                if time.monotonic() >= self.next_tick:
+                    self.tick()
+            # Shutting the sessions down unblocks their handler threads, so the pool drains promptly.
+            self.connection_manager.close_all()
+            self.handler_executor.shutdown(wait=True)
+        finally:
+            self.stop_background()
+            for sock in (self.wakeup_reader, self.wakeup_writer):
+                if sock is not None:
+                    sock.close()
+
+    def stop(self):
+        """Ask the running engine to exit after its current tick; safe to call from a signal handler."""
+        self.running = False
+
+    def start_background(self):
+        """Start the background writers and scanners. Called from start() so every worker process gets its own."""
+        writer = 'main' if self.worker_id is None else f"w{self.worker_id}"
+        self.payload_store = PayloadStore(self.payload_storage_path, self.honeypot_logger, writer=writer,
+                                          **self.payload_store_options)
+        self.payload_store.open()
+        self.metadata_sink = create_metadata_sink(self.session_metadata_path, self.honeypot_logger, writer=writer,
+                                                  **self.metadata_sink_options)
+        self.metadata_sink.start()
+        recorder_options = dict(self.session_recorder_options)
+        if recorder_options.pop('enabled', True):
+            self.session_recorder = SessionRecorder(self.payload_store, self.metadata_sink, logger=self.honeypot_logger,
+                                                    **recorder_options)
+        self.signature_engine = SignatureEngine(self.rule_set, self.report_signature_hit, self.security_logger,
+                                                **self.signature_options)
+        if self.ssh_host_key:
+            self.raw_services[self.ssh_port] = SshEmulator(self, self.ssh_host_key, **self.ssh_options)
+        tarpit_options = dict(self.tarpit_options)
+        if tarpit_options.pop('enabled', False):
+            # Tarpit ports take precedence over their handlers and over SSH emulation.
+            self.tarpit = Tarpit(tarpit_options.pop('ports', {}), logger=self.honeypot_logger,
+                                 on_release=self.record_tarpit, **tarpit_options)
+            self.tarpit.start()
+            for port in self.tarpit.modes:
+                self.raw_services[port] = self.tarpit
+        profiling_options = dict(self.profiling_options)
+        if profiling_options.pop('enabled', True):
+            self.profiler = AttackerProfiler(snapshot_path=os.path.join(self.profile_path, f"attackers-{writer}.json"),
+                                             logger=self.honeypot_logger, **profiling_options)
+        if self.metrics_options.get('enabled', False):
+            # Each supervisor worker serves its own registry on the next port up.
+            port = self.metrics_options.get('port', 9200) + (self.worker_id or 0)
+            self.metrics_server = MetricsServer(self.metrics, self.metrics_options.get('host', '127.0.0.1'), port,
+                                                logger=self.honeypot_logger)
+            if self.profiler:
+                self.metrics_server.add_route('/attackers', self.profiler.render)
+            self.metrics_server.start()
+
+    def stop_background(self):
+        """Finish pending scans, then flush and stop the background writers."""
+        if self.metrics_server:
+            self.metrics_server.stop()
+        for service in set(self.raw_services.values()):
+            service.close()
+        # Sessions the services let go while closing.
+        self.release_handoffs()
+        if self.signature_engine:
+            self.signature_engine.close()
+        if self.session_recorder:
+            # Sessions still open at shutdown are written out as they stand.
+            self.session_recorder.close_all()
+        if self.profiler:
+            self.profiler.close()
+        if self.payload_store:
+            self.payload_store.close()
+        if self.metadata_sink:
+            self.metadata_sink.close()
+
+    def init_metrics(self):
+        self.metrics = MetricsRegistry()
+        self.accepts_metric = self.metrics.counter('honeypot_accepts_total', 'Accepted connections', ['port'])
+        self.rejects_metric = self.metrics.counter('honeypot_rejects_total', 'Connections refused at accept',
+                                                   ['port', 'reason'])
+        self.captures_metric = self.metrics.counter('honeypot_captures_total', 'Captured payload chunks', ['port'])
+        self.signature_hits_metric = self.metrics.counter('honeypot_signature_hits_total',
+                                                          'First signature match per session', ['port', 'rule'])
+        self.handler_duration_metric = self.metrics.histogram('honeypot_handler_duration_seconds',
+                                                              'Session duration from start to end', ['port'])
+        self.bytes_received_metric = self.metrics.histogram('honeypot_bytes_received', 'Size of captured chunks',
+                                                            ['port'], buckets=DEFAULT_SIZE_BUCKETS)
+        self.loop_lag_metric = self.metrics.histogram('honeypot_event_loop_lag_seconds',
+                                                      'How late the periodic tick ran', buckets=DEFAULT_LAG_BUCKETS)
+        self.metrics.gauge('honeypot_open_sessions', 'Sessions currently in progress',
+                           function=lambda: len(self.session_ports))
+        self.metrics.gauge('honeypot_registered_fds', 'Sockets registered with the selector or event loop',
+                           function=self.registered_fds)
+        self.metrics.gauge('honeypot_budgeted_connections', 'Connections counted against the session limits',
+                           function=lambda: len(self.connection_manager))
+        self.metrics.gauge('honeypot_paused_listeners', 'Listeners not accepting because a session limit is reached',
+                           function=lambda: len(self.paused_ports))
+        self.reaped_metric = self.metrics.counter('honeypot_reaped_sessions_total',
+                                                  'Sessions closed by the idle or lifetime reaper', ['port', 'reason'])
+        self.tarpit_seconds_metric = self.metrics.counter('honeypot_tarpit_seconds_total',
+                                                          'Attacker-seconds spent in the tarpit', ['port'])
+        self.metrics.gauge('honeypot_tarpitted_sockets', 'Connections currently held by the tarpit',
+                           function=lambda: len(self.tarpit.sockets) if self.tarpit else 0)
+        self.metrics.gauge('honeypot_tarpit_held_seconds', 'Attacker-seconds spent so far by connections still held',
+                           function=lambda: self.tarpit.held_seconds() if self.tarpit else 0)
+
+    def registered_fds(self):
+        if self.async_engine:
+            return len(self.async_engine.sessions) + len(self.async_engine.listeners)
+        return len(self.selector.get_map())
+
+    def tick(self):
+        """Periodic housekeeping, called by the running engine every tick_interval seconds."""
+        now = time.monotonic()
+        self.loop_lag_metric.observe(max(0.0, now - self.next_tick))
+        self.next_tick = now + self.tick_interval
+        if self.reload_requested or (self.watch_files and now >= self.next_watch_check and self.files_changed()):
+            self.reload()
+        self.rate_limiter.evict_idle()
+        self.network_policy.refresh()
+        self.connection_manager.reap(now)
+        self.release_handoffs()
+        if self.profiler:
+            self.profiler.maybe_snapshot(now)
+        if self.paused_ports and self.async_engine is None:
+            self.update_accepting()
+        if self.stats_channel is not None:
+            self.report_stats()
+
+    def record_stat(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    def report_stats(self):
+        """Send this worker's cumulative counters to the supervisor if they changed."""
+        with self.stats_lock:
+            snapshot = dict(self.stats)
+        if snapshot == self.last_reported_stats:
+            return
+        try:
+            self.stats_channel.put_nowait((self.worker_id, snapshot))
+            self.last_reported_stats = snapshot
+        except Exception as e:
+            self.honeypot_logger.warning(f"Failed to report stats to supervisor: {e}")
+
+    def create_listener(self, port):
+        """Create a bound, non-blocking listening socket for the port."""
+        self.honeypot_logger.debug(f"Attempting to create socket for port {port}")
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.honeypot_logger.debug(f"Binding socket to {self.host}:{port + self.port_offset}")
+        s.bind((self.host, port + self.port_offset))
+        s.listen(self.listen_backlog)
+        s.setblocking(False)
+        return s
 
     def listen_on_port(self, port):
         try:
-            self.honeypot_logger.debug(f"Attempting to create socket for port {port}")
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.honeypot_logger.debug(f"Binding socket to {self.host}:{port}")
-            s.bind((self.host, port))
-            s.listen(5)
-            s.setblocking(False)
+            s = self.create_listener(port)
             self.honeypot_logger.debug(f"Registering socket {s} with selector")
             self.selector.register(s, selectors.EVENT_READ, self.accept_connection)
+            self.listeners[port] = s
             self.honeypot_logger.info(f"Listening on port {port}...")
         except Exception as e:
             self.security_logger.critical(f"Failed to listen on port {port}: {e}")
             self.honeypot_logger.error(f"Exception in listen_on_port: {e}")
             raise
 
+    def close_listener(self, port):
+        sock = self.listeners.pop(port, None)
+        if sock is None:
+            return
+        if port in self.paused_ports:
+            self.paused_ports.discard(port)
+        else:
+            self.selector.unregister(sock)
+        sock.close()
+
     def accept_connection(self, sock, mask):
         conn = None
+        addr = None
+        port = sock.getsockname()[1] - self.port_offset
         try:
-            self.honeypot_logger.debug(f"Attempting to accept connection on socket {sock}")
-            conn, addr = sock.accept()
-            self.honeypot_logger.info(f"Accepted connection from {addr}")
-            conn.setblocking(False)
-            if not self.is_allowed(addr[0]):
-                self.honeypot_logger.warning(f"Disallowed IP {addr[0]}. Closing connection.")
-                conn.close()
-                self.security_logger.warning(f"Connection from disallowed IP {addr[0]} closed.")
+            self.honeypot_logger.debug("Attempting to accept connection on socket %s", sock)
+            try:
+                conn, addr = sock.accept()
+            except OSError as e:
+                if e.errno not in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                    raise
+                # Out of descriptors: stop watching the listeners until the next tick instead of spinning.
+                self.accept_backoff_until = time.monotonic() + self.tick_interval
+                self.update_accepting()
+                self.security_logger.error("Error accepting connection on port %s: %s", port, e)
                 return
-            if self.rate_limit_exceeded(addr[0]):
-                self.honeypot_logger.warning(f"Rate limit exceeded for IP {addr[0]}. Closing connection.")
-                conn.close()
-                self.security_logger.warning(f"Rate limit exceeded for IP {addr[0]}. Connection closed.")
+            self.record_accept(addr, port)
+            self.honeypot_logger.info("Accepted connection from %s", addr)
+            conn.setblocking(False)
+            if not self.admit_connection(conn, addr, port):
                 return
-            port = sock.getsockname()[1]
-            if port in self.services:
-                self.honeypot_logger.info(f"Handler found for port {port}. Registering handler.")
-                self.honeypot_logger.debug(f"Registering connection {conn} with selector")
-                self.selector.register(conn, selectors.EVENT_READ, self.create_handler(self.services[port], conn, addr))
+            if port in self.raw_services:
+                self.hand_off(self.raw_services[port], conn, addr, port)
+                if not self.connection_manager.can_accept(port):
+                    self.update_accepting()
+            elif port in self.services:
+                self.honeypot_logger.debug("Handler found for port %s. Registering handler.", port)
+                self.honeypot_logger.debug("Registering connection %s with selector", conn)
+                session = self.connection_manager.register(addr, port,
+                                                           lambda: self.close_waiting_connection(conn, addr))
+                # A new socket is writable at once, so the handler is dispatched on the next loop pass and
+                # server-first protocols send their banner without waiting for the client.
+                self.selector.register(conn, selectors.EVENT_WRITE,
+                                       self.create_handler(self.services[port], conn, addr, port, session))
                 self.log_connection_start(addr, port)
+                if not self.connection_manager.can_accept(port):
+                    self.update_accepting()
             else:
-                self.honeypot_logger.warning(f"No handler for port {port}. Closing connection from {addr}.")
+                self.honeypot_logger.warning("No handler for port %s. Closing connection from %s.", port, addr)
                 conn.close()
         except Exception as e:
-            self.security_logger.error(f"Error accepting connection: {e}")
-            self.honeypot_logger.error(f"Error accepting connection: {e}")
+            self.security_logger.error("Error accepting connection: %s", e)
+            self.honeypot_logger.error("Error accepting connection: %s", e)
             if conn:
                 self.cleanup_socket(conn)
+                self.end_session(addr)
+
+    def update_accepting(self):
+        """Unregister listeners that are over their session budget and re-register those back under it.
+
+        Connections arriving while a listener is paused wait in the kernel backlog.
+        """
+        backing_off = time.monotonic() < self.accept_backoff_until
+        for port, sock in self.listeners.items():
+            accept = not backing_off and self.connection_manager.can_accept(port)
+            if accept and port in self.paused_ports:
+                self.selector.register(sock, selectors.EVENT_READ, self.accept_connection)
+                self.paused_ports.discard(port)
+                self.honeypot_logger.info("Resumed accepting on port %s", port)
+            elif not accept and port not in self.paused_ports:
+                self.selector.unregister(sock)
+                self.paused_ports.add(port)
+                self.honeypot_logger.warning("Paused accepting on port %s: session limit reached", port)
 
-    def create_handler(self, handler, conn, addr):
-        def wrapped_handler(sock, mask):
-            start_time = datetime.now()
+    def end_session(self, addr):
+        """Write out the session transcript and return the session's slot to the connection budget."""
+        if self.session_recorder:
+            self.session_recorder.close(addr)
+        self.connection_manager.release(addr)
+        if self.paused_ports:
+            self.update_accepting()
+
+    def hand_off(self, service, conn, addr, port):
+        """Give an admitted connection to a service that runs it off the engine thread (e.g. SSH emulation).
+
+        The service owns the socket from here on. Budgeted services count against the
+        session limits, call handoff_done() from their own thread once the session is
+        over, and are ended early by the reaper shutting the socket down.
+        """
+        if service.budgeted:
+            self.connection_manager.register(addr, port, lambda: self.shutdown_connection(conn))
+        service.submit(conn, addr, port)
+
+    def handoff_done(self, addr):
+        """Thread-safe: queue the release of a session that ran off the engine thread, and wake the engine."""
+        self.finished_handoffs.append(addr)
+        if self.async_engine:
+            self.async_engine.call_soon_threadsafe(self.release_handoffs)
+        elif self.wakeup_writer is not None:
             try:
-                self.honeypot_logger.info(f"Handling connection from {addr}")
-                data = sock.recv(1024)
-                if data:
-                    self.honeypot_logger.debug(f"Received data from {addr}: {data}")
-                    handler(conn, addr, self)
-                    self.capture_payload(addr, data)
-                else:
-                    self.honeypot_logger.info(f"No data received. Closing connection from {addr}")
-                    self.cleanup_socket(sock)
-                    self.log_connection_end(addr, start_time)
-            except BlockingIOError as e:
-                self.honeypot_logger.warning(f"Non-blocking socket operation could not be completed immediately for {addr}: {e}")
-            except UnicodeDecodeError as e:
-                self.security_logger.error(f"Decoding error handling connection from {addr}: {e}")
-                self.honeypot_logger.error(f"Decoding error handling connection from {addr}: {e}")
-                self.cleanup_socket(sock)
+                self.wakeup_writer.send(b'\0')
+            except OSError:
+                # Buffer full (a wakeup is already pending) or the engine has shut down.
+                pass
+
+    def drain_wakeups(self, sock, mask):
+        try:
+            while sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        self.release_handoffs()
+
+    def release_handoffs(self):
+        """Release sessions that finished off the engine thread; runs on the engine thread."""
+        released = False
+        while self.finished_handoffs:
+            self.end_session(self.finished_handoffs.popleft())
+            released = True
+        if released and self.async_engine:
+            self.async_engine.capacity_freed.set()
+
+    def shutdown_connection(self, conn):
+        """Reaper callback for sockets owned by another thread: unblock its reads without closing the fd."""
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close_waiting_connection(self, conn, addr):
+        """Reaper callback for a selector connection whose handler has not been dispatched yet."""
+        self.cleanup_socket(conn)
+        self.session_ports.pop(addr, None)
+        self.signature_engine.end_session(addr)
+        self.end_session(addr)
+
+    def record_tarpit(self, addr, port, seconds):
+        """Called from the tarpit thread as it lets a connection go."""
+        self.record_stat('tarpit_released')
+        self.record_stat('tarpit_seconds', seconds)
+        self.tarpit_seconds_metric.inc(port, amount=seconds)
+
+    def record_reap(self, session, reason):
+        self.record_stat(f"reaped_{reason}")
+        self.reaped_metric.inc(session.port, reason)
+
+    def record_accept(self, addr, port):
+        self.record_stat('accepts')
+        self.accepts_metric.inc(port)
+        if self.profiler:
+            self.profiler.record_connection(addr[0], port)
+
+    def record_command(self, addr, command):
+        """Called by line-protocol handlers with each command verb a client sends."""
+        if self.profiler:
+            self.profiler.record_command(addr[0], command)
+
+    def admit_connection(self, conn, addr, port):
+        """Apply the allow list, rate limit and session limits, closing the connection if it is refused."""
+        if not self.is_allowed(addr[0]):
+            self.record_stat('rejected_disallowed')
+            self.rejects_metric.inc(port, 'allow_list')
+            self.honeypot_logger.warning("Disallowed IP %s. Closing connection.", addr[0])
+            conn.close()
+            self.security_logger.warning("Connection from disallowed IP %s closed.", addr[0])
+            return False
+        if self.rate_limit_exceeded(addr[0], port):
+            self.record_stat('rejected_rate_limit')
+            self.rejects_metric.inc(port, 'rate_limit')
+            self.honeypot_logger.warning("Rate limit exceeded for IP %s. Closing connection.", addr[0])
+            conn.close()
+            self.security_logger.warning("Rate limit exceeded for IP %s. Connection closed.", addr[0])
+            return False
+        reason = self.connection_manager.refusal_reason(addr[0], port)
+        if reason:
+            self.record_stat(f"rejected_{reason}")
+            self.rejects_metric.inc(port, reason)
+            self.honeypot_logger.warning("Session limit (%s) reached for IP %s on port %s. Closing connection.",
+                                         reason, addr[0], port)
+            conn.close()
+            self.security_logger.warning("Session limit (%s) reached for IP %s. Connection closed.", reason, addr[0])
+            return False
+        return True
+
+    def create_handler(self, handler, conn, addr, port, session):
+        def dispatch_handler(sock, mask):
+            # Handlers run the whole session with blocking reads on a pool thread, starting from the first
+            # client byte, so a slow client ties up one thread instead of the selector loop.
+            try:
+                self.selector.unregister(sock)
+                sock.setblocking(True)
+                sock.settimeout(self.handler_timeout)
+                # From here the socket belongs to the handler thread; the reaper only unblocks its reads.
+                session.close = lambda: self.shutdown_connection(conn)
+                self.handler_executor.submit(self.run_handler, handler, conn, addr, port)
             except Exception as e:
-                self.security_logger.error(f"Error handling connection from {addr}: {e}")
-                self.honeypot_logger.error(f"Error handling connection from {addr}: {e}")
-                self.cleanup_socket(sock)
-        return wrapped_handler
+                self.security_logger.error("Error dispatching connection from %s: %s", addr, e)
+                self.honeypot_logger.error("Error dispatching connection from %s: %s", addr, e)
+                sock.close()
+                self.session_ports.pop(addr, None)
+                self.end_session(addr)
+        return dispatch_handler
+
+    def run_handler(self, handler, conn, addr, port):
+        """Run a blocking handler session on a pool thread, then hand its release back to the engine thread."""
+        try:
+            self.honeypot_logger.debug("Handling connection from %s", addr)
+            handler(self.record_session(conn, addr, port), addr, self)
+        except UnicodeDecodeError as e:
+            self.security_logger.error("Decoding error handling connection from %s: %s", addr, e)
+            self.honeypot_logger.error("Decoding error handling connection from %s: %s", addr, e)
+        except Exception as e:
+            self.security_logger.error("Error handling connection from %s: %s", addr, e)
+            self.honeypot_logger.error("Error handling connection from %s: %s", addr, e)
+        finally:
+            # Handlers usually close the socket themselves.
+            conn.close()
+            self.handoff_done(addr)
+
+    def record_session(self, conn, addr, port):
+        """Wrap a blocking handler's socket so the session's traffic lands in one transcript."""
+        if not self.session_recorder:
+            return conn
+        return RecordingSocket(conn, self.session_recorder.open(addr, port))
+
+    def record_streams(self, reader, writer, addr, port):
+        """Wrap an async handler's streams so the session's traffic lands in one transcript."""
+        if not self.session_recorder:
+            return reader, writer
+        transcript = self.session_recorder.open(addr, port)
+        return RecordingReader(reader, transcript), RecordingWriter(writer, transcript)
     
     def cleanup_socket(self, sock):
         """Unregister and close the socket safely."""
         try:
             self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            # Not registered, or already closed (fd -1).
+            pass
         except Exception as e:
-            self.honeypot_logger.error(f"Error unregistering socket: {e}")
+            self.honeypot_logger.error("Error unregistering socket: %s", e)
         try:
             sock.close()
         except Exception as e:
-            self.honeypot_logger.error(f"Error closing socket: {e}")
+            self.honeypot_logger.error("Error closing socket: %s", e)
     
     def is_allowed(self, ip):
-        """Check if the IP is allowed to connect."""
-        ip_addr = ipaddress.ip_address(ip)
-        return any(ip_addr in net for net in self.allowed_networks)
-
-    def rate_limit_exceeded(self, ip):
-        """Check if the rate limit is exceeded for the IP."""
-        current_time = time.time()
-        if ip not in self.rate_limit:
-            self.rate_limit[ip] = []
-        self.rate_limit[ip] = [t for t in self.rate_limit[ip] if t > current_time - self.rate_limit_window]
-        if len(self.rate_limit[ip]) >= self.rate_limit_threshold:
-            return True
-        self.rate_limit[ip].append(current_time)
-        return False
+        """Check if the IP is allowed to connect; the most specific allow/deny prefix wins."""
+        return self.network_policy.is_allowed(ip)
+
+    def rate_limit_exceeded(self, ip, port=None):
+        """Check if the rate limit is exceeded for the IP (or its aggregated subnet) on the port."""
+        return self.rate_limiter.exceeded(ip, port)
 
     def capture_payload(self, addr, data):
-        """Capture and store payload data for further analysis."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_hash = hashlib.md5(data).hexdigest()
-        filename = os.path.join(self.payload_storage_path, f"{addr[0]}_{timestamp}_{file_hash}.bin")
-        with open(filename, 'wb') as f:
-            f.write(data)
-        self.honeypot_logger.info(f"Captured payload from {addr} stored in {filename}")
-        self.store_metadata(addr, filename)
-        self.analyze_payload(addr, data)
-
-    def store_metadata(self, addr, payload_filename):
+        """Capture payload data for analysis; stored per chunk only when sessions are not recorded whole."""
+        self.connection_manager.touch(addr)
+        self.record_stat('captures')
+        self.record_stat('captured_bytes', len(data))
+        port = self.session_ports.get(addr)
+        self.captures_metric.inc(port)
+        self.bytes_received_metric.observe(len(data), port)
+        if self.profiler:
+            self.profiler.record_payload(addr[0], data)
+        if not self.session_recorder:
+            payload_hash = self.payload_store.put(data)
+            self.honeypot_logger.debug("Captured payload from %s stored as %s", addr, payload_hash)
+            self.store_metadata(addr, payload_hash, len(data))
+        self.analyze_payload(addr, data, port)
+
+    def store_metadata(self, addr, payload_hash, payload_size):
         """Store metadata related to the captured payload."""
         metadata = {
+            'type': 'capture',
             'source_ip': addr[0],
             'source_port': addr[1],
+            'port': self.session_ports.get(addr),
             'timestamp': datetime.now().isoformat(),
-            'payload_filename': payload_filename,
+            'payload_sha256': payload_hash,
+            'payload_size': payload_size,
         }
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        metadata_filename = f"{self.session_metadata_path}/{addr[0]}_{timestamp}.json"
-        with open(metadata_filename, 'w') as f:
-            json.dump(metadata, f)
-        self.honeypot_logger.info(f"Metadata stored in {metadata_filename}")
+        self.metadata_sink.submit(metadata)
+
+    def record_http_request(self, addr, port, request):
+        """Called by the HTTP handler with each complete request."""
+        self.record_stat('http_requests')
+        self.metadata_sink.submit({
+            'type': 'http_request',
+            'source_ip': addr[0],
+            'source_port': addr[1],
+            'port': port,
+            'timestamp': datetime.now().isoformat(),
+            'method': request.method,
+            'path': request.target,
+            'version': request.version,
+            'headers': request.headers,
+            'body': request.body[:self.http_site.record_body_bytes].decode('utf-8', 'backslashreplace'),
+            'body_size': len(request.body),
+        })
 
     def log_connection_start(self, addr, port):
-        self.honeypot_logger.info(f"Connection started from {addr} on port {port}")
+        self.session_ports[addr] = port
+        self.honeypot_logger.info("Connection started from %s on port %s", addr, port)
 
     def log_connection_end(self, addr, start_time):
+        port = self.session_ports.pop(addr, None)
+        self.signature_engine.end_session(addr)
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        self.honeypot_logger.info(f"Connection from {addr} ended. Duration: {duration:.2f} seconds")
+        self.handler_duration_metric.observe(duration, port)
+        self.honeypot_logger.info("Connection from %s ended. Duration: %.2f seconds", addr, duration)
 
-    def analyze_payload(self, addr, data):
-        """Analyze the payload for suspicious patterns and log warnings if detected."""
-        for pattern in self.suspicious_patterns:
-            if pattern.search(data):
-                self.security_logger.warning(f"Suspicious pattern detected in payload from {addr}")
+    def analyze_payload(self, addr, data, port=None):
+        """Queue the payload for signature scanning as part of the session's byte stream."""
+        self.signature_engine.scan(addr, data, port)
+
+    def report_signature_hit(self, addr, port, rule):
+        """Called from a scanner thread when a signature first matches in a session.
+
+        port is the one the session had when its payload was captured; by now the
+        session may already have ended and left session_ports.
+        """
+        self.record_stat('signature_hits')
+        self.signature_hits_metric.inc(port, rule.id)
+        self.security_logger.warning("Signature %s (%s severity: %s) matched in payload from %s",
+                                     rule.id, rule.severity, rule.description, addr)
+        self.metadata_sink.submit({
+            'type': 'signature_hit',
+            'source_ip': addr[0],
+            'source_port': addr[1],
+            'port': port,
+            'timestamp': datetime.now().isoformat(),
+            'rule_id': rule.id,
+            'severity': rule.severity,
+        })
 
 if __name__ == "__main__":
     try:
-        server = HoneypotServer(honeypot_logger, security_logger)
-        server.start()
+        if len(sys.argv) > 1:
+            server = HoneypotServer(honeypot_logger, security_logger, config_path=os.path.abspath(sys.argv[1]))
+        else:
+            server = HoneypotServer(honeypot_logger, security_logger)
+        if server.workers > 1:
+            if not Supervisor(server, **server.supervisor_options).run():
+                sys.exit(1)
+        else:
+            signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+            signal.signal(signal.SIGHUP, lambda signum, frame: server.request_reload())
+            server.start()
     except Exception as e:
         security_logger.critical(f"Failed to start HoneypotServer: {e}")
         honeypot_logger.critical(f"Failed to start HoneypotServer: {e}")
@@ -0,0 +1,316 @@
+import time
+from email.utils import formatdate
+from http import HTTPStatus
+
+CRLF = b'\r\n'
+DEFAULT_SERVER = 'Apache/2.4.41 (Ubuntu)'
+DEFAULT_ROUTES = {
+    '/': {'body': '<html><head><title>Welcome</title></head><body><h1>Welcome to the HTTP honeypot</h1></body></html>'},
+}
+DEFAULT_NOT_FOUND = {
+    'status': 404,
+    'body': '<html><head><title>404 Not Found</title></head><body><h1>Not Found</h1></body></html>',
+}
+CONTINUE = b'HTTP/1.1 100 Continue\r\n\r\n'
+TOKEN_START = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+HEX_DIGITS = b'0123456789abcdefABCDEF'
+MAX_CHUNK_LINE = 1024
+# States of the chunked-body parser.
+CHUNK_SIZE, CHUNK_DATA, CHUNK_END, CHUNK_TRAILER = range(4)
+
+_date_cache = (0, b'')
+
+
+def date_header():
+    """The Date header line, formatted at most once per second."""
+    global _date_cache
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache = (now, b'Date: ' + formatdate(now, usegmt=True).encode('ascii') + CRLF)
+    return _date_cache[1]
+
+
+class Response:
+    """One route's response, rendered to bytes once for each framing a request can need."""
+    __slots__ = ('status_line', 'keep_alive', 'close', 'head_keep_alive', 'head_close')
+
+    def __init__(self, status=200, body='', content_type='text/html; charset=UTF-8', headers=None,
+                 server_header=DEFAULT_SERVER):
+        body = body.encode('utf-8') if isinstance(body, str) else bytes(body)
+        self.status_line = b'HTTP/1.1 %d %s\r\n' % (status, HTTPStatus(status).phrase.encode('ascii'))
+        fields = {'Server': server_header, 'Content-Type': content_type, 'Content-Length': str(len(body))}
+        fields.update(headers or {})
+        head = b''.join(b'%s: %s\r\n' % (name.encode('latin-1'), str(value).encode('latin-1'))
+                        for name, value in fields.items())
+        self.head_keep_alive = head + b'Connection: keep-alive\r\n\r\n'
+        self.head_close = head + b'Connection: close\r\n\r\n'
+        self.keep_alive = self.head_keep_alive + body
+        self.close = self.head_close + body
+
+    def render(self, keep_alive, head_only=False):
+        if head_only:
+            rest = self.head_keep_alive if keep_alive else self.head_close
+        else:
+            rest = self.keep_alive if keep_alive else self.close
+        return self.status_line + date_header() + rest
+
+
+class HttpSite:
+    """Routes and limits for the HTTP honeypot, built from the 'http' config section.
+
+    ``routes`` maps a path to ``{"status", "body", "content_type", "headers"}``; a
+    path ending in ``*`` matches by prefix, longest first. Everything else gets
+    ``not_found``. All responses are rendered when the site is built, so serving
+    one is a dict lookup and a concatenation.
+    """
+
+    def __init__(self, routes=None, not_found=None, server_header=DEFAULT_SERVER, max_requests=100,
+                 max_header_bytes=16384, max_body_bytes=1048576, record_body_bytes=4096):
+        self.exact = {}
+        prefixes = []
+        for path, route in (DEFAULT_ROUTES if routes is None else routes).items():
+            response = Response(server_header=server_header, **route)
+            if path.endswith('*'):
+                prefixes.append((path[:-1], response))
+            else:
+                self.exact[path] = response
+        self.prefixes = sorted(prefixes, key=lambda prefix: len(prefix[0]), reverse=True)
+        self.not_found = Response(server_header=server_header, **(not_found or DEFAULT_NOT_FOUND))
+        self.errors = {status: Response(status, HTTPStatus(status).phrase, 'text/plain', server_header=server_header)
+                       for status in (400, 413, 431)}
+        self.max_requests = max_requests
+        self.max_header_bytes = max_header_bytes
+        self.max_body_bytes = max_body_bytes
+        self.record_body_bytes = record_body_bytes
+
+    def lookup(self, path):
+        response = self.exact.get(path)
+        if response is not None:
+            return response
+        for prefix, response in self.prefixes:
+            if path.startswith(prefix):
+                return response
+        return self.not_found
+
+
+class HttpRequest:
+    __slots__ = ('method', 'target', 'version', 'headers', 'body', 'content_length', 'chunked')
+
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = b''
+        self.content_length = 0
+        self.chunked = False
+
+    def header(self, name):
+        for key, value in self.headers:
+            if key == name:
+                return value
+        return None
+
+    @property
+    def path(self):
+        return self.target.split('?', 1)[0]
+
+    def keep_alive(self):
+        connection = (self.header('connection') or '').lower()
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in connection
+        return 'close' not in connection
+
+
+class BadRequest(Exception):
+    def __init__(self, status=400):
+        super().__init__(status)
+        self.status = status
+
+
+class HttpProtocol:
+    """Incremental, I/O-free HTTP/1.x server with the LineProtocol interface (greeting/feed/closed).
+
+    feed() buffers whatever arrived, parses every complete request in it (headers
+    split across reads, pipelined requests, Content-Length and chunked bodies) and
+    returns the responses in order. Connections are kept alive per HTTP/1.0 and
+    1.1 rules, up to the site's ``max_requests``. Malformed or oversized requests
+    get a 400, 413 or 431 and the connection is closed. on_request(request) is
+    called for each complete request; on_command gets its method, like a
+    LineProtocol command.
+    """
+    on_command = None
+
+    def __init__(self, site, on_request=None):
+        self.site = site
+        self.on_request = on_request
+        self.buffer = bytearray()
+        self.closed = False
+        self.request = None
+        self.continued = False
+        self.requests = 0
+        self.chunk_state = CHUNK_SIZE
+        self.chunk_remaining = 0
+        self.chunked_body = bytearray()
+        self.chunked_size = 0
+        self.trailer_bytes = 0
+
+    def greeting(self):
+        return b''
+
+    def feed(self, data):
+        self.buffer += data
+        replies = []
+        try:
+            while not self.closed:
+                if self.request is None:
+                    self.request = self.parse_head()
+                    if self.request is None:
+                        break
+                    self.continued = False
+                if not self.read_body(replies):
+                    break
+                request, self.request = self.request, None
+                replies.append(self.respond(request))
+        except BadRequest as e:
+            self.closed = True
+            replies.append(self.site.errors[e.status].render(keep_alive=False))
+        return b''.join(replies)
+
+    def parse_head(self):
+        buffer = self.buffer
+        # Stray CRLFs between pipelined requests are allowed before a request line.
+        while buffer[:2] == CRLF or buffer[:1] == b'\n':
+            del buffer[:2 if buffer[:1] == b'\r' else 1]
+        if buffer and buffer[0] not in TOKEN_START and buffer != b'\r':
+            # TLS handshakes, binary probes and the like.
+            raise BadRequest()
+        end = buffer.find(b'\n\r\n')
+        bare = buffer.find(b'\n\n')
+        if bare >= 0 and (end < 0 or bare < end):
+            end, size = bare, 2
+        else:
+            size = 3
+        if end < 0:
+            if len(buffer) > self.site.max_header_bytes:
+                raise BadRequest(431)
+            return None
+        if end > self.site.max_header_bytes:
+            raise BadRequest(431)
+        lines = bytes(buffer[:end]).decode('latin-1').split('\n')
+        del buffer[:end + size]
+        parts = lines[0].rstrip('\r').split(' ')
+        if len(parts) != 3 or not parts[0].isalpha() or not parts[2].startswith('HTTP/1.'):
+            raise BadRequest()
+        headers = []
+        for line in lines[1:]:
+            name, separator, value = line.rstrip('\r').partition(':')
+            if not separator or not name or name != name.strip():
+                raise BadRequest()
+            headers.append((name.lower(), value.strip()))
+        request = HttpRequest(parts[0], parts[1], parts[2], headers)
+        if 'chunked' in (request.header('transfer-encoding') or '').lower():
+            request.chunked = True
+            self.chunk_state = CHUNK_SIZE
+            self.chunked_body = bytearray()
+            self.chunked_size = 0
+            self.trailer_bytes = 0
+        else:
+            lengths = {value for key, value in headers if key == 'content-length'}
+            length = lengths.pop() if len(lengths) == 1 else '0'
+            # isascii(): str.isdigit() also accepts characters such as superscript digits.
+            if lengths or not (length.isascii() and length.isdigit()):
+                raise BadRequest()
+            request.content_length = int(length)
+            if request.content_length > self.site.max_body_bytes:
+                raise BadRequest(413)
+        return request
+
+    def read_body(self, replies):
+        request = self.request
+        if request.chunked:
+            if not self.read_chunked():
+                self.expect_continue(replies)
+                return False
+            request.body = bytes(self.chunked_body)
+            self.chunked_body = bytearray()
+            return True
+        length = request.content_length
+        if len(self.buffer) < length:
+            self.expect_continue(replies)
+            return False
+        request.body = bytes(self.buffer[:length])
+        del self.buffer[:length]
+        return True
+
+    def expect_continue(self, replies):
+        if not self.continued and (self.request.header('expect') or '').lower() == '100-continue':
+            self.continued = True
+            replies.append(CONTINUE)
+
+    def read_chunked(self):
+        """Consume as much of a chunked body as the buffer holds; True once the message is complete.
+
+        The parser keeps its state between feeds, so each byte is looked at once.
+        Chunk-size lines are capped at MAX_CHUNK_LINE and trailers at the site's
+        max_header_bytes.
+        """
+        buffer = self.buffer
+        while True:
+            if self.chunk_state == CHUNK_DATA:
+                size = min(self.chunk_remaining, len(buffer))
+                if size:
+                    self.chunked_body += buffer[:size]
+                    del buffer[:size]
+                    self.chunk_remaining -= size
+                if self.chunk_remaining:
+                    return False
+                self.chunk_state = CHUNK_END
+            line_end = buffer.find(b'\n')
+            if line_end < 0:
+                if self.chunk_state == CHUNK_TRAILER:
+                    if self.trailer_bytes + len(buffer) > self.site.max_header_bytes:
+                        raise BadRequest(431)
+                elif len(buffer) > MAX_CHUNK_LINE:
+                    raise BadRequest()
+                return False
+            line = bytes(buffer[:line_end]).rstrip(b'\r')
+            del buffer[:line_end + 1]
+            if self.chunk_state == CHUNK_SIZE:
+                size_field = line.split(b';', 1)[0].rstrip(b' \t')
+                # Only hex digits: int(x, 16) would also take '-1', '0x10', ' 10' or '1_0'.
+                if not size_field or len(size_field) > 16 or size_field.lstrip(HEX_DIGITS):
+                    raise BadRequest()
+                size = int(size_field, 16)
+                self.chunked_size += size
+                if self.chunked_size > self.site.max_body_bytes:
+                    raise BadRequest(413)
+                if size:
+                    self.chunk_state = CHUNK_DATA
+                    self.chunk_remaining = size
+                else:
+                    self.chunk_state = CHUNK_TRAILER
+            elif self.chunk_state == CHUNK_END:
+                if line:
+                    raise BadRequest()
+                self.chunk_state = CHUNK_SIZE
+            else:
+                self.trailer_bytes += line_end + 1
+                if self.trailer_bytes > self.site.max_header_bytes:
+                    raise BadRequest(431)
+                if not line:
+                    # The blank line that ends the message.
+                    self.chunk_state = CHUNK_SIZE
+                    return True
+
+    def respond(self, request):
+        self.requests += 1
+        if self.on_command:
+            self.on_command(request.method.encode('latin-1'))
+        if self.on_request:
+            self.on_request(request)
+        keep_alive = request.keep_alive() and self.requests < self.site.max_requests
+        if not keep_alive:
+            self.closed = True
+        response = self.site.lookup(request.path)
+        return response.render(keep_alive, head_only=request.method == 'HEAD')
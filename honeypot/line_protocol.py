@@ -0,0 +1,117 @@
+import asyncio
+import socket
+from datetime import datetime
+
+CRLF = b'\r\n'
+
+
+class LineProtocol:
+    """Incremental, I/O-free base for line-oriented protocols (FTP, SMTP, POP3, Telnet).
+
+    feed() takes whatever bytes arrived, frames them into lines (CRLF or bare LF),
+    and returns the concatenated replies, so pipelined commands and commands split
+    across reads behave the same. Subclasses map upper-cased command bytes to
+    methods in ``commands``; each method takes the argument bytes and returns the
+    reply bytes (ideally a pre-encoded module constant) or None. Setting
+    ``self.closed`` ends the session once the pending replies are sent. The drivers
+    set ``on_command`` so each command verb also reaches the server's profiler.
+    """
+    banner = b''
+    commands = {}
+    unknown_reply = b'500 Command not understood' + CRLF
+    max_line = 8192
+    on_command = None
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.closed = False
+
+    def greeting(self):
+        return self.banner
+
+    def feed(self, data):
+        self.buffer += data
+        replies = []
+        while not self.closed:
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                if len(self.buffer) <= self.max_line:
+                    break
+                # An endless line is answered as if it had been terminated here.
+                end = len(self.buffer)
+            line = bytes(self.buffer[:end]).rstrip(b'\r')
+            del self.buffer[:end + 1]
+            reply = self.line_received(line)
+            if reply:
+                replies.append(reply)
+        return b''.join(replies)
+
+    def line_received(self, line):
+        command, _, argument = line.strip().partition(b' ')
+        command = command.upper()
+        self.command_received(command)
+        method = self.commands.get(command)
+        if method is None:
+            return self.unknown_command(command, argument)
+        return method(self, argument.strip())
+
+    def command_received(self, command):
+        if self.on_command and command:
+            self.on_command(command)
+
+    def unknown_command(self, command, argument):
+        return self.unknown_reply
+
+
+def serve_blocking(protocol, conn, addr, server, port, logger):
+    """Run a LineProtocol session (or any protocol with the same greeting/feed/closed interface) on a blocking socket."""
+    start_time = datetime.now()
+    server.log_connection_start(addr, port)
+    protocol.on_command = lambda command: server.record_command(addr, command)
+    try:
+        greeting = protocol.greeting()
+        if greeting:
+            conn.sendall(greeting)
+        while not protocol.closed:
+            data = conn.recv(4096)
+            if not data:
+                break
+            server.capture_payload(addr, data)
+            reply = protocol.feed(data)
+            if reply:
+                conn.sendall(reply)
+    except socket.timeout:
+        logger.debug("Connection from %s timed out.", addr)
+    except Exception as e:
+        logger.error("Error handling connection from %s on port %s: %s", addr, port, e)
+    finally:
+        conn.close()
+        server.log_connection_end(addr, start_time)
+
+
+async def serve_async(protocol, reader, writer, addr, server, port, logger):
+    """Run a LineProtocol session (or any protocol with the same greeting/feed/closed interface) on asyncio streams."""
+    start_time = datetime.now()
+    server.log_connection_start(addr, port)
+    protocol.on_command = lambda command: server.record_command(addr, command)
+    try:
+        greeting = protocol.greeting()
+        if greeting:
+            writer.write(greeting)
+            await writer.drain()
+        while not protocol.closed:
+            data = await asyncio.wait_for(reader.read(4096), server.handler_timeout)
+            if not data:
+                break
+            server.capture_payload(addr, data)
+            reply = protocol.feed(data)
+            if reply:
+                writer.write(reply)
+                await writer.drain()
+    except asyncio.TimeoutError:
+        logger.debug("Connection from %s timed out.", addr)
+    except Exception as e:
+        logger.error("Error handling connection from %s on port %s: %s", addr, port, e)
+    finally:
+        writer.close()
+        server.log_connection_end(addr, start_time)
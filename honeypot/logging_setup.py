@@ -0,0 +1,120 @@
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import sys
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_LEVELS = {
+    'honeypot': 'INFO',
+    'security': 'WARNING',
+    'handlers': 'INFO',
+    # paramiko logs a traceback for every scanner that drops the connection mid-handshake.
+    'paramiko': 'CRITICAL',
+}
+
+_listener = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising when the queue is full.
+
+    Unless the queue crosses a process boundary, records are enqueued unformatted so
+    message interpolation happens on the listener thread rather than the caller's.
+    """
+
+    def __init__(self, log_queue, defer_formatting=True):
+        super().__init__(log_queue)
+        self.defer_formatting = defer_formatting
+        self.dropped = 0
+
+    def prepare(self, record):
+        if self.defer_formatting:
+            return record
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class PrefixFilter(logging.Filter):
+    """Pass records whose logger name is one of the prefixes or a child of one."""
+
+    def __init__(self, *prefixes):
+        super().__init__()
+        self.prefixes = prefixes
+
+    def filter(self, record):
+        return any(record.name == prefix or record.name.startswith(prefix + '.') for prefix in self.prefixes)
+
+
+def build_file_handler(path, rotation):
+    if rotation.get('type') == 'time':
+        return logging.handlers.TimedRotatingFileHandler(path, when=rotation.get('when', 'midnight'),
+                                                         interval=rotation.get('interval', 1),
+                                                         backupCount=rotation.get('backup_count', 7))
+    return logging.handlers.RotatingFileHandler(path, maxBytes=rotation.get('max_bytes', 10 * 1024 * 1024),
+                                                backupCount=rotation.get('backup_count', 5))
+
+
+def configure_logging(options, log_dir, multiprocess=False):
+    """Route every record through a bounded queue; formatting and file I/O happen on a listener thread.
+
+    Levels are set per logger ('honeypot', 'security', and 'handlers' for the port handler
+    modules), so disabled messages are discarded before anything is formatted. With
+    multiprocess=True the queue is shared with forked workers and only the parent writes files.
+    Calling this again replaces the previous pipeline.
+    """
+    global _listener
+    stop_logging()
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(options.get('format', DEFAULT_FORMAT))
+    rotation = options.get('rotation', {})
+
+    honeypot_file = build_file_handler(os.path.join(log_dir, 'honeypot.log'), rotation)
+    honeypot_file.addFilter(PrefixFilter('honeypot', 'handlers'))
+    security_file = build_file_handler(os.path.join(log_dir, 'security_warning.log'), rotation)
+    security_file.addFilter(PrefixFilter('security'))
+    outputs = [honeypot_file, security_file]
+    if options.get('console', True):
+        outputs.append(logging.StreamHandler(sys.stderr))
+    for output in outputs:
+        output.setFormatter(formatter)
+
+    queue_size = options.get('queue_size', 10000)
+    if multiprocess:
+        log_queue = multiprocessing.get_context('fork').Queue(queue_size)
+    else:
+        log_queue = queue.Queue(queue_size)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue, defer_formatting=not multiprocess))
+    root.setLevel(options.get('level', 'WARNING'))
+    levels = dict(DEFAULT_LEVELS, **options.get('loggers', {}))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *outputs, respect_handler_level=True)
+    _listener.start()
+    # Re-register so the listener drains before multiprocessing's own exit hooks tear the queue down.
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Drain the queue and close the output files."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+
+from batching import BatchWriter
+
+
+class JsonlSink(BatchWriter):
+    """Append-only JSON Lines sink, one file per writer process, one write per batch."""
+
+    def __init__(self, root, logger, writer='main', fsync=False, **batch_options):
+        super().__init__(f"metadata-jsonl-{writer}", logger, **batch_options)
+        self.path = os.path.join(root, f"metadata-{writer}.jsonl")
+        self.fsync = fsync
+        self.file = None
+
+    def on_start(self):
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def write_batch(self, records):
+        self.file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def on_close(self):
+        if self.file:
+            self.file.close()
+
+
+class SqliteSink(BatchWriter):
+    """SQLite sink in WAL mode, committing one transaction per batch.
+
+    All writer processes share one database; WAL plus a busy timeout lets supervisor
+    workers interleave their group commits.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS metadata (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            type TEXT NOT NULL,
+            source_ip TEXT,
+            source_port INTEGER,
+            port INTEGER,
+            payload_sha256 TEXT,
+            record TEXT NOT NULL
+        )
+    """
+
+    def __init__(self, root, logger, writer='main', fsync=False, **batch_options):
+        super().__init__(f"metadata-sqlite-{writer}", logger, **batch_options)
+        self.path = os.path.join(root, 'metadata.db')
+        self.fsync = fsync
+        self.db = None
+
+    def on_start(self):
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        self.db.execute(self.SCHEMA)
+        self.db.commit()
+
+    def write_batch(self, records):
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO metadata (timestamp, type, source_ip, source_port, port, payload_sha256, record) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(record['timestamp'], record['type'], record.get('source_ip'), record.get('source_port'),
+                  record.get('port'), record.get('payload_sha256'), json.dumps(record, separators=(',', ':')))
+                 for record in records])
+
+    def on_close(self):
+        if self.db:
+            self.db.close()
+
+
+SINKS = {
+    'jsonl': JsonlSink,
+    'sqlite': SqliteSink,
+}
+
+
+def create_metadata_sink(root, logger, writer='main', **options):
+    """Build the sink described by the 'metadata_sink' config section."""
+    sink_type = options.pop('type', 'jsonl')
+    if sink_type not in SINKS:
+        raise ValueError(f"Unknown metadata sink type: {sink_type}")
+    os.makedirs(root, exist_ok=True)
+    return SINKS[sink_type](root, logger, writer=writer, **options)
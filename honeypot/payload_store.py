@@ -0,0 +1,131 @@
+import glob
+import hashlib
+import os
+import re
+import struct
+import threading
+
+from batching import BatchWriter
+
+# digest, segment number, offset, length
+INDEX_RECORD = struct.Struct('<32sIQI')
+SEGMENT_NAME = re.compile(r'pack-(?P<writer>[\w-]+)-(?P<segment>\d+)\.pack$')
+
+
+class PayloadStore(BatchWriter):
+    """Content-addressed, deduplicated payload storage.
+
+    Each unique payload is stored once, keyed by its SHA-256 digest, by appending it to
+    a rotating pack segment (``pack-<writer>-<segment>.pack``). A fixed-size record per
+    blob goes to the writer's offset index (``pack-<writer>.idx``). Every process writes
+    only its own segments and index, so supervisor workers never contend on a file.
+    """
+
+    def __init__(self, root, logger, writer='main', segment_max_bytes=64 * 1024 * 1024,
+                 fsync=False, **batch_options):
+        super().__init__(f"payload-store-{writer}", logger, **batch_options)
+        self.root = root
+        self.writer = writer
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self.index = {}
+        self.index_lock = threading.Lock()
+        self.segment = 0
+        self.segment_file = None
+        self.index_file = None
+        os.makedirs(root, exist_ok=True)
+
+    def open(self):
+        self.load_index()
+        segments = [int(m.group('segment')) for m in map(SEGMENT_NAME.search, glob.glob(self.segment_path('*')))
+                    if m and m.group('writer') == self.writer]
+        self.segment = max(segments, default=0)
+        self.segment_file = open(self.segment_path(self.segment), 'ab')
+        self.index_file = open(self.index_path(self.writer), 'ab')
+        self.start()
+        self.logger.info(f"Payload store opened at {self.root} with {len(self.index)} known payloads")
+
+    def segment_path(self, segment):
+        name = f"{segment:06d}" if isinstance(segment, int) else segment
+        return os.path.join(self.root, f"pack-{self.writer}-{name}.pack")
+
+    def index_path(self, writer):
+        return os.path.join(self.root, f"pack-{writer}.idx")
+
+    def load_index(self):
+        """Load the offset index of every writer so payloads stored by earlier runs dedupe too."""
+        for path in glob.glob(os.path.join(self.root, 'pack-*.idx')):
+            writer = os.path.basename(path)[len('pack-'):-len('.idx')]
+            with open(path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for digest, segment, offset, length in INDEX_RECORD.iter_unpack(data[:usable]):
+                self.index[digest] = (writer, segment, offset, length)
+
+    def put(self, data):
+        """Store a payload if it is new and return its hex SHA-256; never touches disk on the caller's thread."""
+        digest = hashlib.sha256(data).digest()
+        with self.index_lock:
+            if digest in self.index:
+                return digest.hex()
+            self.index[digest] = None
+        if not self.submit((digest, bytes(data))):
+            with self.index_lock:
+                self.index.pop(digest, None)
+        return digest.hex()
+
+    def get(self, hex_digest):
+        """Return the stored payload bytes, or None if unknown or not yet flushed."""
+        location = self.index.get(bytes.fromhex(hex_digest))
+        if location is None:
+            return None
+        writer, segment, offset, length = location
+        path = os.path.join(self.root, f"pack-{writer}-{segment:06d}.pack")
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def write_batch(self, items):
+        try:
+            self.append_batch(items)
+        except Exception:
+            # Forget the placeholders put() left for this batch, so each payload is stored on its next sighting.
+            with self.index_lock:
+                for digest, _ in items:
+                    if digest in self.index and self.index[digest] is None:
+                        del self.index[digest]
+            raise
+
+    def append_batch(self, items):
+        records = []
+        for digest, data in items:
+            if self.segment_file.tell() + len(data) > self.segment_max_bytes and self.segment_file.tell() > 0:
+                self.rotate()
+            offset = self.segment_file.tell()
+            self.segment_file.write(data)
+            records.append((digest, self.segment, offset, len(data)))
+        # Blobs must be durable before the index points at them.
+        self.sync(self.segment_file)
+        self.index_file.write(b''.join(INDEX_RECORD.pack(*record) for record in records))
+        self.sync(self.index_file)
+        with self.index_lock:
+            for digest, segment, offset, length in records:
+                self.index[digest] = (self.writer, segment, offset, length)
+
+    def sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def rotate(self):
+        self.sync(self.segment_file)
+        self.segment_file.close()
+        self.segment += 1
+        self.segment_file = open(self.segment_path(self.segment), 'ab')
+        self.logger.info(f"Rotated payload pack to segment {self.segment}")
+
+    def on_close(self):
+        for f in (self.segment_file, self.index_file):
+            if f:
+                self.sync(f)
+                f.close()
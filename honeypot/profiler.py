@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sketches import CountMinSketch, HyperLogLog, SpaceSaving, SpaceSavingEntry, hash64
+
+
+class Profile(SpaceSavingEntry):
+    """A top talker: its connection count plus small sketches of what it did while tracked."""
+    __slots__ = ('ports', 'payloads', 'commands', 'bytes', 'first_seen', 'last_seen')
+
+    def __init__(self, key, precision=6):
+        super().__init__(key)
+        self.ports = HyperLogLog(precision)
+        self.payloads = HyperLogLog(precision)
+        self.commands = {}
+        self.bytes = 0
+        self.first_seen = self.last_seen = time.time()
+
+    def copy(self):
+        other = Profile.__new__(Profile)
+        other.key, other.count, other.error = self.key, self.count, self.error
+        other.ports = self.ports.copy()
+        other.payloads = self.payloads.copy()
+        other.commands = dict(self.commands)
+        other.bytes = self.bytes
+        other.first_seen, other.last_seen = self.first_seen, self.last_seen
+        return other
+
+    def reset(self, key, count):
+        super().reset(key, count)
+        self.ports = HyperLogLog(self.ports.precision)
+        self.payloads = HyperLogLog(self.payloads.precision)
+        self.commands = {}
+        self.bytes = 0
+        self.first_seen = self.last_seen = time.time()
+
+
+class AttackerProfiler:
+    """Per-source statistics in constant memory, however many addresses scan the honeypot.
+
+    Connection and byte counts for every source go to count-min sketches, distinct
+    sources, payloads and commands to HyperLogLogs, and the ``top_k`` sources by
+    connections are tracked with space-saving. Each tracked source carries small
+    HyperLogLogs of the ports it touched and the distinct payload chunks it sent,
+    plus up to ``max_commands`` command counts; that state starts over if the source
+    drops out of the top K and comes back. The record_* methods may be called from
+    any thread. Reports copy the sketches under the lock and do the counting,
+    serializing and (for periodic snapshots) file writing on the caller's or a
+    background thread, so recording never waits on them.
+    """
+
+    def __init__(self, top_k=1000, width=2048, depth=4, precision=12, source_precision=6, max_commands=16,
+                 top_commands=100, snapshot_path=None, snapshot_interval=60, logger=None):
+        self.lock = threading.Lock()
+        self.talkers = SpaceSaving(top_k, factory=lambda ip: Profile(ip, source_precision))
+        self.connections = CountMinSketch(width, depth)
+        self.volume = CountMinSketch(width, depth)
+        self.command_counts = CountMinSketch(width, depth)
+        self.commands = SpaceSaving(top_commands)
+        self.sources = HyperLogLog(precision)
+        self.payloads = HyperLogLog(precision)
+        self.max_commands = max_commands
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.next_snapshot = time.monotonic() + snapshot_interval
+        self.started = datetime.now().isoformat()
+        self.logger = logger
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profile-snapshot')
+        self.pending_snapshot = None
+
+    def record_connection(self, ip, port):
+        with self.lock:
+            self.connections.add(ip)
+            self.sources.add(ip)
+            profile, _ = self.talkers.add(ip)
+            profile.ports.add(port)
+            profile.last_seen = time.time()
+
+    def record_payload(self, ip, data):
+        payload_hash = hash64(data)
+        with self.lock:
+            self.volume.add(ip, len(data))
+            self.payloads.add_hash(payload_hash)
+            profile = self.talkers.get(ip)
+            if profile is not None:
+                profile.payloads.add_hash(payload_hash)
+                profile.bytes += len(data)
+
+    def record_command(self, ip, command):
+        command = command[:32].decode('ascii', 'backslashreplace')
+        with self.lock:
+            self.command_counts.add(command)
+            self.commands.add(command)
+            profile = self.talkers.get(ip)
+            if profile is not None and (command in profile.commands or len(profile.commands) < self.max_commands):
+                profile.commands[command] = profile.commands.get(command, 0) + 1
+
+    def profile(self, ip):
+        """Everything known about one source; exact fields only if it is a tracked top talker."""
+        with self.lock:
+            profile = self.talkers.get(ip)
+            if profile is not None:
+                profile = profile.copy()
+            else:
+                return {
+                    'source_ip': ip,
+                    'tracked': False,
+                    'connections': self.connections.estimate(ip),
+                    'bytes': self.volume.estimate(ip),
+                }
+        return self.describe(profile)
+
+    def describe(self, profile):
+        return {
+            'source_ip': profile.key,
+            'tracked': True,
+            'connections': profile.count,
+            'connections_error': profile.error,
+            'bytes': profile.bytes,
+            'distinct_ports': profile.ports.count(),
+            'distinct_payloads': profile.payloads.count(),
+            'commands': dict(profile.commands),
+            'first_seen': datetime.fromtimestamp(profile.first_seen).isoformat(),
+            'last_seen': datetime.fromtimestamp(profile.last_seen).isoformat(),
+        }
+
+    def capture(self):
+        """Copy what a summary needs; the only part of a report that holds the lock."""
+        with self.lock:
+            return {
+                'timestamp': datetime.now().isoformat(),
+                'connections': self.connections.total,
+                'bytes': self.volume.total,
+                'sources': self.sources.copy(),
+                'payloads': self.payloads.copy(),
+                'commands': [(entry.key, entry.count) for entry in self.commands.entries.values()],
+                'command_estimates': {entry.key: self.command_counts.estimate(entry.key)
+                                      for entry in self.commands.entries.values()},
+                'talkers': [profile.copy() for profile in self.talkers.entries.values()],
+            }
+
+    def summary(self, limit=None, state=None):
+        state = state or self.capture()
+        commands = sorted(state['commands'], key=lambda command: command[1], reverse=True)
+        talkers = sorted(state['talkers'], key=lambda profile: profile.count, reverse=True)
+        if limit:
+            commands, talkers = commands[:limit], talkers[:limit]
+        return {
+            'timestamp': state['timestamp'],
+            'since': self.started,
+            'connections': state['connections'],
+            'bytes': state['bytes'],
+            'distinct_sources': state['sources'].count(),
+            'distinct_payloads': state['payloads'].count(),
+            'commands': [{'command': key, 'count': state['command_estimates'][key]} for key, _ in commands],
+            'top_talkers': [self.describe(profile) for profile in talkers],
+        }
+
+    def render(self, query):
+        """MetricsServer route: ``/attackers?ip=<address>`` for one source, else ``?limit=<n>`` top talkers."""
+        if 'ip' in query:
+            body = self.profile(query['ip'][0])
+        else:
+            limit = query.get('limit', ['100'])[0]
+            body = self.summary(int(limit) if limit.isdigit() else 100)
+        return 'application/json', json.dumps(body)
+
+    def maybe_snapshot(self, now):
+        """Called from the engine tick: copy the sketches and leave the writing to the snapshot thread."""
+        if not self.snapshot_path or now < self.next_snapshot:
+            return
+        self.next_snapshot = now + self.snapshot_interval
+        if self.pending_snapshot is not None and not self.pending_snapshot.done():
+            return
+        self.pending_snapshot = self.writer.submit(self.snapshot, self.capture())
+
+    def close(self):
+        """Wait for a snapshot in progress, then write the final one."""
+        self.writer.shutdown(wait=True)
+        self.snapshot()
+
+    def snapshot(self, state=None):
+        """Write the summary next to the captures, replacing the previous snapshot atomically."""
+        if not self.snapshot_path:
+            return
+        temporary_path = self.snapshot_path + '.tmp'
+        try:
+            with open(temporary_path, 'w') as f:
+                json.dump(self.summary(state=state), f, separators=(',', ':'))
+            os.replace(temporary_path, self.snapshot_path)
+        except OSError as e:
+            if self.logger:
+                self.logger.error("Failed to write attacker profile snapshot %s: %s", self.snapshot_path, e)
@@ -0,0 +1,319 @@
+"""Query captured sessions and payloads through an incrementally maintained index.
+
+The index (``index.db`` in the capture directory) is brought up to date before
+each query by reading only what was appended since the last run: metadata JSONL
+files, the SQLite metadata sink, legacy per-capture session JSON files and the
+payload pack indexes. Results stream to stdout as JSON Lines:
+
+    python honeypot/query.py --ip 203.0.113.7
+    python honeypot/query.py --port 25 --since 2026-10-17T02:00 --until 2026-10-17T03:00
+    python honeypot/query.py --hash 5f2b --type transcript
+    python honeypot/query.py --grep '/bin/busybox' --port 23
+"""
+import argparse
+import bisect
+import glob
+import json
+import mmap
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from payload_store import INDEX_RECORD, SEGMENT_NAME
+
+LEGACY_SETTLE_NS = 2 * 10**9
+LEGACY_PAYLOAD_NAME = re.compile(r'_(?P<timestamp>\d{8}_\d{6})_(?P<md5>[0-9a-f]{32})\.bin$')
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS records (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT,
+        type TEXT,
+        source_ip TEXT,
+        source_port INTEGER,
+        port INTEGER,
+        payload_sha256 TEXT,
+        payload_file TEXT,
+        origin TEXT UNIQUE,
+        record TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS records_ip ON records (source_ip, timestamp);
+    CREATE INDEX IF NOT EXISTS records_port ON records (port, timestamp);
+    CREATE INDEX IF NOT EXISTS records_hash ON records (payload_sha256);
+    CREATE INDEX IF NOT EXISTS records_time ON records (timestamp);
+    CREATE TABLE IF NOT EXISTS payloads (
+        sha256 TEXT PRIMARY KEY,
+        writer TEXT,
+        segment INTEGER,
+        offset INTEGER,
+        length INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS sources (
+        path TEXT PRIMARY KEY,
+        position INTEGER NOT NULL
+    );
+"""
+
+
+class QueryIndex:
+    """SQLite index over a capture directory (``payloads/`` and ``sessions/``)."""
+
+    def __init__(self, capture_root, index_path=None):
+        self.capture_root = capture_root
+        self.payload_root = os.path.join(capture_root, 'payloads')
+        self.session_root = os.path.join(capture_root, 'sessions')
+        self.db = sqlite3.connect(index_path or os.path.join(capture_root, 'index.db'))
+        self.db.executescript(SCHEMA)
+
+    def position(self, source):
+        row = self.db.execute('SELECT position FROM sources WHERE path = ?', (source,)).fetchone()
+        return row[0] if row else 0
+
+    def set_position(self, source, position):
+        self.db.execute('INSERT OR REPLACE INTO sources (path, position) VALUES (?, ?)', (source, position))
+
+    def update(self):
+        """Index everything appended since the last update; returns the number of new records."""
+        added = 0
+        with self.db:
+            for path in sorted(glob.glob(os.path.join(self.session_root, 'metadata-*.jsonl'))):
+                added += self.index_jsonl(path)
+            sink_path = os.path.join(self.session_root, 'metadata.db')
+            if os.path.exists(sink_path):
+                added += self.index_sink(sink_path)
+            added += self.index_legacy_sessions()
+            for path in sorted(glob.glob(os.path.join(self.payload_root, 'pack-*.idx'))):
+                self.index_pack(path)
+        return added
+
+    def insert(self, record, origin=None, payload_file=None):
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO records (timestamp, type, source_ip, source_port, port, payload_sha256, '
+            'payload_file, origin, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (record.get('timestamp'), record.get('type'), record.get('source_ip'), record.get('source_port'),
+             record.get('port'), record.get('payload_sha256'), payload_file, origin,
+             json.dumps(record, separators=(',', ':'))))
+        return cursor.rowcount
+
+    def index_jsonl(self, path):
+        start = self.position(path)
+        added = 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        # Only whole lines; a line still being written is picked up next time.
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                added += self.insert(json.loads(line))
+            except ValueError:
+                continue
+        self.set_position(path, start + end)
+        return added
+
+    def index_sink(self, path):
+        last_id = self.position(path)
+        added = 0
+        sink = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for row_id, record in sink.execute('SELECT id, record FROM metadata WHERE id > ? ORDER BY id', (last_id,)):
+                added += self.insert(json.loads(record))
+                last_id = row_id
+        finally:
+            sink.close()
+        self.set_position(path, last_id)
+        return added
+
+    def index_legacy_sessions(self):
+        """Index the per-capture JSON files written by earlier versions, newest since the last run."""
+        source = os.path.join(self.session_root, '*.json')
+        try:
+            directory_mtime = os.stat(self.session_root).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        # Legacy captures were only ever created, never appended to, so an unchanged directory has nothing new.
+        if directory_mtime == self.position(self.session_root):
+            return 0
+        watermark = self.position(source)
+        newest = watermark
+        added = 0
+        try:
+            entries = os.scandir(self.session_root)
+        except FileNotFoundError:
+            return 0
+        with entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                if mtime < watermark:
+                    continue
+                newest = max(newest, mtime)
+                try:
+                    with open(entry.path) as f:
+                        record = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                record.setdefault('type', 'capture')
+                # Stored paths were relative to wherever the server ran, so match on the file name.
+                payload_file = os.path.basename(record.get('payload_filename') or '')
+                match = LEGACY_PAYLOAD_NAME.search(payload_file)
+                if match:
+                    record.setdefault('payload_md5', match.group('md5'))
+                # origin makes re-reading files at the watermark's mtime harmless.
+                added += self.insert(record, origin=entry.path, payload_file=payload_file or None)
+        self.set_position(source, newest)
+        # A file created within the filesystem's timestamp granularity of the scan may not move the mtime,
+        # so only trust it once it is a couple of seconds old.
+        if time.time_ns() - directory_mtime > LEGACY_SETTLE_NS:
+            self.set_position(self.session_root, directory_mtime)
+        return added
+
+    def index_pack(self, path):
+        writer = os.path.basename(path)[len('pack-'):-len('.idx')]
+        start = self.position(path)
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        self.db.executemany(
+            'INSERT OR IGNORE INTO payloads (sha256, writer, segment, offset, length) VALUES (?, ?, ?, ?, ?)',
+            ((digest.hex(), writer, segment, offset, length)
+             for digest, segment, offset, length in INDEX_RECORD.iter_unpack(data[:usable])))
+        self.set_position(path, start + usable)
+
+    def search_packs(self, pattern):
+        """Yield the SHA-256 of every stored payload containing pattern, scanning memory-mapped pack segments."""
+        for path in sorted(glob.glob(os.path.join(self.payload_root, 'pack-*.pack'))):
+            match = SEGMENT_NAME.search(path)
+            if not match:
+                continue
+            blobs = self.db.execute('SELECT offset, length, sha256 FROM payloads WHERE writer = ? AND segment = ? '
+                                    'ORDER BY offset', (match.group('writer'), int(match.group('segment')))).fetchall()
+            if not blobs:
+                continue
+            starts = [offset for offset, _, _ in blobs]
+            found = set()
+            for position in scan_file(path, pattern):
+                index = bisect.bisect_right(starts, position) - 1
+                if index < 0:
+                    continue
+                offset, length, sha256 = blobs[index]
+                # Matches spanning two blobs are not matches in either.
+                if position + len(pattern) <= offset + length and sha256 not in found:
+                    found.add(sha256)
+                    yield sha256
+
+    def search_legacy_payloads(self, pattern):
+        """Yield the names of legacy per-capture .bin files containing pattern."""
+        for entry in os.scandir(self.payload_root):
+            if entry.name.endswith('.bin') and next(scan_file(entry.path, pattern), None) is not None:
+                yield entry.name
+
+    def query(self, ip=None, port=None, since=None, until=None, payload_hash=None, record_type=None, limit=None,
+              hashes=None, files=None):
+        """Yield matching records, oldest first, as they are read from the index."""
+        clauses = []
+        params = []
+        if ip:
+            clauses.append('source_ip = ?')
+            params.append(ip)
+        if port is not None:
+            clauses.append('port = ?')
+            params.append(port)
+        if since:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        if record_type:
+            clauses.append('type = ?')
+            params.append(record_type)
+        if payload_hash:
+            # Prefix match that can still use the hash index; legacy records only carry an MD5.
+            clauses.append("((payload_sha256 >= ? AND payload_sha256 < ?) OR json_extract(record, '$.payload_md5') = ?)")
+            params.extend([payload_hash, payload_hash + 'g', payload_hash])
+        if hashes is not None or files is not None:
+            self.db.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (value TEXT PRIMARY KEY)')
+            self.db.execute('DELETE FROM wanted')
+            self.db.executemany('INSERT OR IGNORE INTO wanted VALUES (?)',
+                                ((value,) for value in list(hashes or []) + list(files or [])))
+            clauses.append('(payload_sha256 IN (SELECT value FROM wanted) OR payload_file IN (SELECT value FROM wanted))')
+        sql = 'SELECT record FROM records'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY timestamp'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        for (record,) in self.db.execute(sql, params):
+            yield record
+
+    def close(self):
+        self.db.close()
+
+
+def scan_file(path, pattern):
+    """Yield every offset of pattern in the file, searching a read-only memory map."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            position = view.find(pattern)
+            while position >= 0:
+                yield position
+                position = view.find(pattern, position + 1)
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value).isoformat()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--captures', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'captures'),
+                        help='capture directory (the server\'s capture_root)')
+    parser.add_argument('--index', help='index database path (default: <captures>/index.db)')
+    parser.add_argument('--no-update', action='store_true', help='query the index as it is')
+    parser.add_argument('--ip', help='source IP address')
+    parser.add_argument('--port', type=int, help='honeypot port')
+    parser.add_argument('--since', type=parse_time, help='ISO timestamp, inclusive')
+    parser.add_argument('--until', type=parse_time, help='ISO timestamp, exclusive')
+    parser.add_argument('--hash', dest='payload_hash', type=str.lower,
+                        help='payload SHA-256 or a prefix of it, or a legacy MD5')
+    parser.add_argument('--type', dest='record_type', help='record type: transcript, capture, signature_hit, ...')
+    pattern = parser.add_mutually_exclusive_group()
+    pattern.add_argument('--grep', help='only records whose payload contains this text')
+    pattern.add_argument('--grep-hex', help='only records whose payload contains these bytes, given as hex')
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args(argv)
+
+    index = QueryIndex(args.captures, args.index)
+    try:
+        if not args.no_update:
+            added = index.update()
+            if added:
+                print(f"Indexed {added} new records", file=sys.stderr)
+        hashes = files = None
+        needle = args.grep.encode() if args.grep else bytes.fromhex(args.grep_hex) if args.grep_hex else None
+        if needle:
+            hashes = list(index.search_packs(needle))
+            files = list(index.search_legacy_payloads(needle)) if os.path.isdir(index.payload_root) else []
+        out = sys.stdout
+        for record in index.query(args.ip, args.port, args.since, args.until, args.payload_hash, args.record_type,
+                                  args.limit, hashes, files):
+            out.write(record + '\n')
+        out.flush()
+    except BrokenPipeError:
+        # Output piped into head or similar; stop quietly.
+        sys.stderr.close()
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
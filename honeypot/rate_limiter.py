@@ -0,0 +1,80 @@
+import ipaddress
+import time
+from collections import OrderedDict
+
+
+class Bucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Token-bucket rate limiter with O(1) checks and a bounded, LRU-evicted table.
+
+    A source may make up to ``threshold`` connections in a burst, refilled at
+    threshold/window per second. Sources are aggregated by prefix (``ipv4_prefix``
+    and ``ipv6_prefix``, /32 and /128 by default), so a /24 or /64 can share one
+    bucket. Ports listed under ``ports`` get their own buckets and limits; all other
+    ports share the default bucket of a source. The table holds at most
+    ``max_entries`` buckets: the least recently used is evicted when it is full,
+    and buckets that have been idle long enough to refill completely are dropped by
+    evict_idle().
+    """
+
+    def __init__(self, window=60, threshold=100, max_entries=100000, ipv4_prefix=32, ipv6_prefix=128, ports=None):
+        self.default_limit = (threshold, threshold / window, window)
+        self.port_limits = {
+            int(port): (limits.get('threshold', threshold),
+                        limits.get('threshold', threshold) / limits.get('window', window),
+                        limits.get('window', window))
+            for port, limits in (ports or {}).items()
+        }
+        self.max_entries = max_entries
+        self.shifts = {4: 32 - ipv4_prefix, 6: 128 - ipv6_prefix}
+        self.idle_after = max(limit[2] for limit in [self.default_limit, *self.port_limits.values()])
+        self.buckets = OrderedDict()
+
+    def key(self, ip, port):
+        address = ipaddress.ip_address(ip)
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        scope = port if port in self.port_limits else None
+        return scope, address.version, int(address) >> self.shifts[address.version]
+
+    def exceeded(self, ip, port=None, now=None):
+        """Take a token for the source, returning True if none was available."""
+        now = time.monotonic() if now is None else now
+        key = self.key(ip, port)
+        capacity, refill_rate, _ = self.port_limits.get(key[0], self.default_limit)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(capacity, now)
+            if len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * refill_rate)
+            bucket.updated = now
+        if bucket.tokens < 1:
+            return True
+        bucket.tokens -= 1
+        return False
+
+    def evict_idle(self, now=None):
+        """Drop buckets untouched for a full window; they would be back at capacity anyway."""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.idle_after
+        evicted = 0
+        while self.buckets:
+            key, bucket = next(iter(self.buckets.items()))
+            if bucket.updated > cutoff:
+                break
+            del self.buckets[key]
+            evicted += 1
+        return evicted
+
+    def __len__(self):
+        return len(self.buckets)
@@ -0,0 +1,201 @@
+import threading
+import time
+from datetime import datetime
+
+# A transcript is stored as two payloads, everything the client sent and everything
+# the honeypot sent, plus a timeline of [direction, milliseconds since the session
+# started, length] per send or receive in the metadata record. The payloads carry no
+# timing, so identical dialogues dedupe in the payload store.
+INBOUND = b'<'
+OUTBOUND = b'>'
+
+
+class Transcript:
+    """Both directions of one session, each appended into a capped bytearray, and their timeline."""
+    __slots__ = ('addr', 'port', 'started', 'started_at', 'inbound', 'outbound', 'timeline', 'max_bytes',
+                 'max_chunks', 'bytes_in', 'bytes_out', 'truncated_bytes')
+
+    def __init__(self, addr, port, max_bytes, max_chunks):
+        self.addr = addr
+        self.port = port
+        self.started = time.monotonic()
+        self.started_at = datetime.now()
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+        self.timeline = []
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.truncated_bytes = 0
+
+    def record(self, direction, data):
+        size = len(data)
+        if not size:
+            return
+        if direction == INBOUND:
+            self.bytes_in += size
+            stream = self.inbound
+        else:
+            self.bytes_out += size
+            stream = self.outbound
+        # Keep the start of the dialogue; once a cap is hit only count what was dropped.
+        if (len(self.inbound) + len(self.outbound) + size > self.max_bytes
+                or len(self.timeline) >= self.max_chunks):
+            self.truncated_bytes += size
+            return
+        offset_ms = int((time.monotonic() - self.started) * 1000)
+        self.timeline.append((direction.decode('ascii'), offset_ms, size))
+        stream += data
+
+
+def iter_chunks(record, inbound, outbound):
+    """Yield (direction, offset_ms, data) for each chunk of a stored transcript, given its record and payloads."""
+    positions = {INBOUND: 0, OUTBOUND: 0}
+    streams = {INBOUND: inbound, OUTBOUND: outbound}
+    for direction, offset_ms, size in record['timeline']:
+        direction = direction.encode('ascii')
+        position = positions[direction]
+        positions[direction] = position + size
+        yield direction, offset_ms, bytes(streams[direction][position:position + size])
+
+
+class RecordingSocket:
+    """Socket proxy for blocking handlers that copies everything sent and received into a transcript."""
+    __slots__ = ('sock', 'transcript')
+
+    def __init__(self, sock, transcript):
+        self.sock = sock
+        self.transcript = transcript
+
+    def recv(self, bufsize, flags=0):
+        data = self.sock.recv(bufsize, flags)
+        self.transcript.record(INBOUND, data)
+        return data
+
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        received = self.sock.recv_into(buffer, nbytes, flags)
+        self.transcript.record(INBOUND, memoryview(buffer)[:received])
+        return received
+
+    def send(self, data, flags=0):
+        sent = self.sock.send(data, flags)
+        self.transcript.record(OUTBOUND, memoryview(data)[:sent])
+        return sent
+
+    def sendall(self, data, flags=0):
+        self.sock.sendall(data, flags)
+        self.transcript.record(OUTBOUND, data)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class RecordingReader:
+    """asyncio.StreamReader proxy that records everything read into a transcript."""
+
+    def __init__(self, reader, transcript):
+        self.reader = reader
+        self.transcript = transcript
+
+    async def read(self, n=-1):
+        data = await self.reader.read(n)
+        self.transcript.record(INBOUND, data)
+        return data
+
+    async def readline(self):
+        data = await self.reader.readline()
+        self.transcript.record(INBOUND, data)
+        return data
+
+    async def readexactly(self, n):
+        data = await self.reader.readexactly(n)
+        self.transcript.record(INBOUND, data)
+        return data
+
+    async def readuntil(self, separator=b'\n'):
+        data = await self.reader.readuntil(separator)
+        self.transcript.record(INBOUND, data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+
+class RecordingWriter:
+    """asyncio.StreamWriter proxy that records everything written into a transcript."""
+
+    def __init__(self, writer, transcript):
+        self.writer = writer
+        self.transcript = transcript
+
+    def write(self, data):
+        self.writer.write(data)
+        self.transcript.record(OUTBOUND, data)
+
+    def writelines(self, data):
+        for chunk in data:
+            self.write(chunk)
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+
+class SessionRecorder:
+    """Keeps one Transcript per open session and writes it out once, when the session ends.
+
+    The inbound and outbound streams go to the payload store and a single 'transcript'
+    record goes to the metadata sink, instead of one capture per recv(). The record's
+    payload_sha256 is the digest of what the client sent, so a payload hash still finds
+    every source that sent it; outbound_sha256 and the timeline replay the dialogue.
+    """
+
+    def __init__(self, payload_store, metadata_sink, max_bytes=1048576, max_chunks=4096, logger=None):
+        self.payload_store = payload_store
+        self.metadata_sink = metadata_sink
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        self.logger = logger
+        self.transcripts = {}
+        self.lock = threading.Lock()
+
+    def open(self, addr, port):
+        transcript = Transcript(addr, port, self.max_bytes, self.max_chunks)
+        with self.lock:
+            self.transcripts[addr] = transcript
+        return transcript
+
+    def close(self, addr):
+        with self.lock:
+            transcript = self.transcripts.pop(addr, None)
+        if transcript is None or not transcript.timeline:
+            return None
+        payload_hash = self.payload_store.put(transcript.inbound) if transcript.inbound else None
+        outbound_hash = self.payload_store.put(transcript.outbound) if transcript.outbound else None
+        self.metadata_sink.submit({
+            'type': 'transcript',
+            'source_ip': addr[0],
+            'source_port': addr[1],
+            'port': transcript.port,
+            'timestamp': transcript.started_at.isoformat(),
+            'duration': round(time.monotonic() - transcript.started, 3),
+            'payload_sha256': payload_hash,
+            'payload_size': len(transcript.inbound),
+            'outbound_sha256': outbound_hash,
+            'outbound_size': len(transcript.outbound),
+            'bytes_in': transcript.bytes_in,
+            'bytes_out': transcript.bytes_out,
+            'chunks': len(transcript.timeline),
+            'timeline': transcript.timeline,
+            'truncated_bytes': transcript.truncated_bytes,
+        })
+        if self.logger:
+            self.logger.debug("Recorded transcript of session from %s: %s bytes in as %s, %s bytes out as %s",
+                              addr, len(transcript.inbound), payload_hash, len(transcript.outbound), outbound_hash)
+        return payload_hash
+
+    def close_all(self):
+        with self.lock:
+            addrs = list(self.transcripts)
+        for addr in addrs:
+            self.close(addr)
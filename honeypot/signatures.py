@@ -0,0 +1,154 @@
+import json
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Used when no rules file is configured; mirrors the patterns the server always shipped with.
+DEFAULT_RULES = [
+    {'id': 'nop-sled', 'severity': 'high', 'type': 'regex', 'pattern': '\\x90{100,}', 'description': 'NOP sled'},
+    {'id': 'cmd-exe', 'severity': 'medium', 'type': 'literal', 'pattern': 'cmd.exe', 'description': 'Command execution'},
+    {'id': 'bin-sh', 'severity': 'medium', 'type': 'literal', 'pattern': '/bin/sh', 'description': 'Shell execution'},
+    {'id': 'rootkit', 'severity': 'high', 'type': 'literal', 'pattern': 'rootkit', 'description': 'Rootkit signature'},
+]
+MAX_SUBSETS = 1024
+
+
+class Rule:
+    __slots__ = ('id', 'severity', 'description', 'group')
+
+    def __init__(self, rule_id, severity, description, group):
+        self.id = rule_id
+        self.severity = severity
+        self.description = description
+        self.group = group
+
+
+class RuleSet:
+    """All signatures compiled into a single alternation, scanned in one pass."""
+
+    def __init__(self, rules):
+        self.rules = {}
+        self.alternatives = []
+        self.subsets = {}
+        for index, spec in enumerate(rules):
+            pattern = spec['pattern'].encode('latin-1')
+            if spec.get('type', 'regex') == 'literal':
+                pattern = re.escape(pattern)
+            if re.compile(pattern).groupindex:
+                raise ValueError(f"Signature {spec['id']} must not use named groups")
+            group = f"r{index}"
+            self.rules[group] = Rule(spec['id'], spec.get('severity', 'medium'), spec.get('description', ''), group)
+            self.alternatives.append((spec['id'], b'(?P<%s>%s)' % (group.encode(), pattern)))
+        self.matcher = self.compile(self.alternatives)
+
+    @staticmethod
+    def compile(alternatives):
+        if not alternatives:
+            return None
+        return re.compile(b'|'.join(alternative for _, alternative in alternatives), re.DOTALL)
+
+    def matcher_excluding(self, rule_ids):
+        """The alternation without the given rules, or None if no rule is left; compiled once per set."""
+        if not rule_ids:
+            return self.matcher
+        key = frozenset(rule_ids)
+        matcher = self.subsets.get(key, False)
+        if matcher is False:
+            if len(self.subsets) >= MAX_SUBSETS:
+                self.subsets.clear()
+            matcher = self.subsets[key] = self.compile([alternative for alternative in self.alternatives
+                                                        if alternative[0] not in key])
+        return matcher
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as rules_file:
+            return cls(json.load(rules_file)['rules'])
+
+    def __len__(self):
+        return len(self.rules)
+
+
+class SessionState:
+    __slots__ = ('port', 'tail', 'hits')
+
+    def __init__(self, port):
+        self.port = port
+        self.tail = b''
+        self.hits = set()
+
+
+class SignatureEngine:
+    """Streaming signature scanner running on a small pool of worker threads.
+
+    Sessions are sharded onto single-thread executors by address, so chunks of one
+    session are scanned in order without locking. Each session keeps the last
+    max_match_span bytes it has seen, which lets a match straddle recv boundaries;
+    every rule is reported at most once per session, as on_hit(session, port, rule)
+    with the port passed to scan().
+    """
+
+    def __init__(self, rule_set, on_hit, logger, workers=2, max_match_span=1024, max_sessions=100000):
+        self.rule_set = rule_set
+        self.on_hit = on_hit
+        self.logger = logger
+        self.max_match_span = max_match_span
+        self.max_sessions_per_shard = max(1, max_sessions // workers)
+        self.shards = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"signature-scan-{i}") for i in range(workers)]
+        self.states = [OrderedDict() for _ in range(workers)]
+
+    def shard(self, session):
+        return hash(session) % len(self.shards)
+
+    def scan(self, session, data, port=None):
+        """Queue a chunk of a session's payload for scanning; returns immediately."""
+        shard = self.shard(session)
+        self.shards[shard].submit(self.scan_chunk, shard, session, port, bytes(data))
+
+    def end_session(self, session):
+        shard = self.shard(session)
+        self.shards[shard].submit(self.states[shard].pop, session, None)
+
+    def scan_chunk(self, shard, session, port, data):
+        try:
+            states = self.states[shard]
+            state = states.get(session)
+            if state is None:
+                state = states[session] = SessionState(port)
+                if len(states) > self.max_sessions_per_shard:
+                    states.popitem(last=False)
+            else:
+                states.move_to_end(session)
+            window = state.tail + data
+            self.find_hits(session, state, window)
+            state.tail = window[-self.max_match_span:]
+        except Exception as e:
+            self.logger.error(f"Signature scan failed for {session}: {e}")
+
+    def find_hits(self, session, state, window):
+        """Report every rule not yet hit in the session that matches in window.
+
+        finditer() only yields leftmost, non-overlapping matches, so a match can hide
+        another rule's overlapping one. Rules already hit are left out of the
+        alternation, and the window is scanned again whenever a pass hits a new rule.
+        """
+        rule_set = self.rule_set
+        found = True
+        while found:
+            matcher = rule_set.matcher_excluding(state.hits)
+            if matcher is None:
+                return
+            found = False
+            for match in matcher.finditer(window):
+                # Matches that end inside the carried-over tail were already examined with the previous chunk.
+                if match.end() <= len(state.tail):
+                    continue
+                rule = rule_set.rules[match.lastgroup]
+                if rule.id not in state.hits:
+                    state.hits.add(rule.id)
+                    self.on_hit(session, state.port, rule)
+                    found = True
+
+    def close(self):
+        for executor in self.shards:
+            executor.shutdown(wait=True)
@@ -0,0 +1,159 @@
+import hashlib
+import math
+from array import array
+
+MASK64 = (1 << 64) - 1
+
+
+def hash64(value):
+    """Stable 64-bit hash of str, bytes or int keys (the built-in hash() is salted per process)."""
+    if isinstance(value, int):
+        # splitmix64 finaliser: cheap and well mixed for small integers such as ports.
+        value = (value + 0x9E3779B97F4A7C15) & MASK64
+        value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+        return value ^ (value >> 31)
+    if isinstance(value, str):
+        value = value.encode('utf-8', 'surrogateescape')
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'little')
+
+
+class CountMinSketch:
+    """Approximate per-key counters in width * depth cells; estimates never undercount.
+
+    With width w and depth d, an estimate exceeds the true count by more than
+    2/w of the total added with probability at most 2^-d.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.cells = array('Q', bytes(8 * width * depth))
+        self.total = 0
+
+    def indexes(self, key):
+        h = hash64(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        cells = self.cells
+        for index in self.indexes(key):
+            cells[index] += count
+        self.total += count
+
+    def estimate(self, key):
+        cells = self.cells
+        return min(cells[index] for index in self.indexes(key))
+
+
+class HyperLogLog:
+    """Distinct-count estimator in 2^precision one-byte registers (standard error ~1.04/sqrt(2^precision))."""
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, h):
+        precision = self.precision
+        index = h >> (64 - precision)
+        # Position of the first set bit after the index bits, counted from 1.
+        rank = min(65 - ((h << precision) & MASK64).bit_length(), 65 - precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def copy(self):
+        other = HyperLogLog.__new__(HyperLogLog)
+        other.precision = self.precision
+        other.registers = bytearray(self.registers)
+        return other
+
+    def count(self):
+        m = len(self.registers)
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty.
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """Top-K heavy hitters over a stream of unit increments (Metwally et al.'s stream-summary).
+
+    Tracks at most ``capacity`` keys. A new key replaces one with the minimum count
+    and inherits that count as its error bound, so counts are overestimates by at
+    most ``error``. Keys are grouped in buckets by count, which makes both
+    increments and evictions O(1). add() returns the tracked entry and the key it
+    displaced, if any, so callers can hang per-key state off the entry.
+    """
+
+    def __init__(self, capacity=1000, factory=None):
+        self.capacity = capacity
+        self.factory = factory or SpaceSavingEntry
+        self.entries = {}
+        self.buckets = {}
+        self.min_count = 0
+
+    def add(self, key):
+        entry = self.entries.get(key)
+        evicted = None
+        if entry is None:
+            if len(self.entries) < self.capacity:
+                entry = self.factory(key)
+                self.entries[key] = entry
+                self.buckets.setdefault(0, set()).add(key)
+                self.min_count = 0
+            else:
+                evicted = self.buckets[self.min_count].pop()
+                self.buckets[self.min_count].add(key)
+                entry = self.entries.pop(evicted)
+                entry.reset(key, self.min_count)
+                self.entries[key] = entry
+        count = entry.count
+        bucket = self.buckets[count]
+        bucket.discard(key)
+        if not bucket:
+            del self.buckets[count]
+            if count == self.min_count:
+                self.min_count = count + 1
+        entry.count = count + 1
+        self.buckets.setdefault(count + 1, set()).add(key)
+        return entry, evicted
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def top(self, limit=None):
+        ranked = sorted(self.entries.values(), key=lambda entry: entry.count, reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SpaceSavingEntry:
+    __slots__ = ('key', 'count', 'error')
+
+    def __init__(self, key):
+        self.key = key
+        self.count = 0
+        self.error = 0
+
+    def reset(self, key, count):
+        self.key = key
+        self.count = count
+        self.error = count
@@ -0,0 +1,271 @@
+import base64
+import hashlib
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+from session_recorder import INBOUND, OUTBOUND
+
+SSH_AVAILABLE = paramiko is not None
+
+DEFAULT_BANNER = 'SSH-2.0-OpenSSH_7.9p1 Debian-10+deb9u1'
+PROMPT = b'root@debian:~# '
+MOTD = b'Linux debian 4.19.0-18-amd64 #1 SMP Debian 4.19.208-1 (2021-09-29) x86_64\r\n\r\n'
+SHELL_REPLIES = {
+    b'whoami': b'root\r\n',
+    b'id': b'uid=0(root) gid=0(root) groups=0(root)\r\n',
+    b'pwd': b'/root\r\n',
+    b'hostname': b'debian\r\n',
+    b'uname': b'Linux\r\n',
+    b'uname -a': b'Linux debian 4.19.0-18-amd64 #1 SMP Debian 4.19.208-1 (2021-09-29) x86_64 GNU/Linux\r\n',
+    b'ls': b'',
+    b'cd': b'',
+    b'echo': b'\r\n',
+}
+EXIT_COMMANDS = frozenset((b'exit', b'logout', b'quit'))
+SHELL_LINE_LIMIT = 4096
+
+
+def load_host_key(path, logger=None):
+    """Load the RSA host key, generating and saving one on first use so clients see a stable key."""
+    if os.path.exists(path):
+        return paramiko.RSAKey.from_private_key_file(path)
+    key = paramiko.RSAKey.generate(2048)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    key.write_private_key_file(path)
+    os.chmod(path, 0o600)
+    if logger:
+        logger.info("Generated SSH host key %s", path)
+    return key
+
+
+def key_fingerprint(key):
+    digest = base64.b64encode(hashlib.sha256(key.asbytes()).digest()).rstrip(b'=')
+    return 'SHA256:' + digest.decode('ascii')
+
+
+class SshSession(paramiko.ServerInterface if paramiko else object):
+    """Server side of one SSH connection: records every login attempt and hands out a fake shell."""
+
+    def __init__(self, emulator, addr, port):
+        self.emulator = emulator
+        self.addr = addr
+        self.port = port
+        self.attempts = 0
+        self.requests = {}
+        self.requested = threading.Event()
+        self.transcript = None
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_auth_password(self, username, password):
+        self.attempts += 1
+        accepted = self.emulator.shell and self.attempts > self.emulator.accept_after
+        self.emulator.record_login(self.addr, self.port, username, 'password', accepted, password=password)
+        return paramiko.AUTH_SUCCESSFUL if accepted else paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        # Always refused, so clients go on to try passwords.
+        self.emulator.record_login(self.addr, self.port, username, 'publickey', False, key_type=key.get_name(),
+                                   key_fingerprint=key_fingerprint(key))
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session' and self.emulator.shell:
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.requests[channel.get_id()] = None
+        self.requested.set()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.requests[channel.get_id()] = bytes(command)
+        self.requested.set()
+        return True
+
+    def wait_for_request(self, channel, timeout):
+        """Wait for the client to ask for a shell or a command on channel; returns (requested, command)."""
+        deadline = time.monotonic() + timeout
+        while channel.get_id() not in self.requests:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.requested.wait(remaining):
+                return False, None
+            self.requested.clear()
+        return True, self.requests.pop(channel.get_id())
+
+
+class SshEmulator:
+    """Completes real SSH handshakes with paramiko on a bounded thread pool.
+
+    The engines hand admitted port-22 sockets to submit() instead of running a
+    handler, so key exchange never blocks the event loop or selector. Username,
+    password and public-key attempts become 'ssh_auth' metadata records. With
+    ``shell`` enabled, the password attempt after ``accept_after`` failures
+    succeeds and the client gets a canned shell; its input is captured (and so
+    scanned for signatures) and recorded as the session transcript. Each session
+    also occupies paramiko's own transport thread, so ``workers`` bounds the
+    concurrent sessions; further sockets wait in the pool's queue.
+    """
+    budgeted = True
+
+    def __init__(self, server, host_key, workers=256, banner=DEFAULT_BANNER, login_timeout=30, shell=False,
+                 accept_after=2):
+        self.server = server
+        self.host_key = host_key
+        self.banner = banner
+        self.login_timeout = login_timeout
+        self.shell = shell
+        self.accept_after = accept_after
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='honeypot-ssh')
+
+    def submit(self, conn, addr, port):
+        future = self.executor.submit(self.run, conn, addr, port)
+        future.add_done_callback(partial(self.release_cancelled, conn, addr))
+
+    def release_cancelled(self, conn, addr, future):
+        # A session cancelled while still queued never ran, so close its socket and give back its slot here.
+        if future.cancelled():
+            conn.close()
+            self.server.handoff_done(addr)
+
+    def close(self):
+        # Sessions were shut down by the engine already, so the workers finish promptly.
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, conn, addr, port):
+        server = self.server
+        start_time = datetime.now()
+        server.log_connection_start(addr, port)
+        transport = None
+        try:
+            conn.setblocking(True)
+            transport = paramiko.Transport(conn)
+            transport.local_version = self.banner
+            transport.banner_timeout = transport.handshake_timeout = server.handler_timeout
+            transport.auth_timeout = self.login_timeout
+            transport.add_server_key(self.host_key)
+            session = SshSession(self, addr, port)
+            transport.start_server(server=session)
+            # Clients often run a few exec requests, each on a new channel, before disconnecting.
+            channel = self.accept_channel(transport)
+            while channel is not None:
+                requested, command = session.wait_for_request(channel, self.login_timeout)
+                if requested:
+                    self.serve_channel(session, channel, command)
+                else:
+                    channel.close()
+                channel = self.accept_channel(transport)
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            server.honeypot_logger.debug("SSH session from %s ended: %s", addr, e)
+        except Exception as e:
+            server.security_logger.error("Error handling SSH connection from %s: %s", addr, e)
+            server.honeypot_logger.error("Error handling SSH connection from %s: %s", addr, e)
+        finally:
+            if transport is not None:
+                transport.close()
+            conn.close()
+            server.log_connection_end(addr, start_time)
+            server.handoff_done(addr)
+
+    def accept_channel(self, transport):
+        deadline = time.monotonic() + self.login_timeout
+        while transport.is_active() and time.monotonic() < deadline:
+            channel = transport.accept(1)
+            if channel is not None:
+                return channel
+        return None
+
+    def record_login(self, addr, port, username, method, accepted, **details):
+        server = self.server
+        server.connection_manager.touch(addr)
+        server.record_stat(f"ssh_{method}_attempts")
+        server.security_logger.warning("SSH %s login attempt from %s as %r (%s)", method, addr[0], username,
+                                       'accepted' if accepted else 'rejected')
+        record = {
+            'type': 'ssh_auth',
+            'source_ip': addr[0],
+            'source_port': addr[1],
+            'port': port,
+            'timestamp': datetime.now().isoformat(),
+            'method': method,
+            'username': username,
+            'accepted': accepted,
+        }
+        record.update(details)
+        server.metadata_sink.submit(record)
+
+    def serve_channel(self, session, channel, command):
+        server = self.server
+        addr = session.addr
+        transcript = session.transcript
+        if transcript is None and server.session_recorder:
+            transcript = session.transcript = server.session_recorder.open(addr, session.port)
+
+        def send(data):
+            if data:
+                channel.sendall(data)
+                if transcript:
+                    transcript.record(OUTBOUND, data)
+
+        def run_command(line):
+            if transcript:
+                transcript.record(INBOUND, line + b'\n')
+            server.capture_payload(addr, line)
+            server.record_command(addr, line.split(b' ', 1)[0])
+            send(self.reply(line))
+
+        channel.settimeout(server.handler_timeout)
+        try:
+            if command is not None:
+                run_command(command.strip())
+                channel.send_exit_status(0)
+                return
+            send(MOTD + PROMPT)
+            buffer = bytearray()
+            while True:
+                data = channel.recv(1024)
+                if not data:
+                    break
+                # Echo as a pty would; the client sends bare CRs for Enter.
+                send(data.replace(b'\r', b'\r\n'))
+                buffer += data.replace(b'\r', b'\n')
+                while b'\n' in buffer:
+                    line, _, rest = bytes(buffer).partition(b'\n')
+                    buffer = bytearray(rest)
+                    line = line.strip()
+                    if line in EXIT_COMMANDS:
+                        channel.send_exit_status(0)
+                        return
+                    if line:
+                        run_command(line)
+                    send(PROMPT)
+                if len(buffer) > SHELL_LINE_LIMIT:
+                    run_command(bytes(buffer))
+                    buffer.clear()
+        except socket.timeout:
+            server.honeypot_logger.debug("SSH shell from %s timed out.", addr)
+        finally:
+            channel.close()
+
+    def reply(self, line):
+        reply = SHELL_REPLIES.get(line)
+        if reply is None:
+            reply = SHELL_REPLIES.get(line.split(b' ', 1)[0])
+        if reply is None:
+            reply = b'-bash: %s: command not found\r\n' % line.split(b' ', 1)[0]
+        return reply
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from collections import Counter, deque
+
+
+def run_worker(server, worker_id, stats_channel):
+    """Entry point of a forked worker: bind the shared ports and run the configured engine."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Stop cooperatively so the engine's finally blocks flush the storage writers.
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    signal.signal(signal.SIGHUP, lambda signum, frame: server.request_reload())
+    server.worker_id = worker_id
+    server.stats_channel = stats_channel
+    server.honeypot_logger.info(f"Worker {worker_id} started with pid {os.getpid()}")
+    try:
+        server.start()
+    except Exception as e:
+        server.security_logger.critical(f"Worker {worker_id} failed: {e}")
+        raise
+
+
+class Supervisor:
+    """Fork N workers that share the listening ports through SO_REUSEPORT and merge their stats.
+
+    The kernel load-balances incoming connections across the workers' listeners, so
+    accepting, parsing and capture I/O scale across cores. Each worker pushes its
+    cumulative counters over a queue; the parent keeps the latest snapshot per worker
+    and periodically logs the merged totals.
+
+    A worker that exits unexpectedly is restarted after ``restart_delay`` seconds,
+    doubling for each restart it already had within ``restart_window`` seconds, up to
+    ``max_restart_delay``. After ``max_restarts`` restarts within the window the
+    supervisor gives up, stops the other workers and run() returns False.
+    """
+
+    def __init__(self, server, restart_delay=1, max_restart_delay=60, max_restarts=5, restart_window=300):
+        self.server = server
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.restarts = {}
+        self.pending_restarts = {}
+        self.failed = False
+        self.honeypot_logger = server.honeypot_logger
+        self.security_logger = server.security_logger
+        self.context = multiprocessing.get_context('fork')
+        self.stats_channel = self.context.Queue()
+        self.processes = {}
+        self.worker_stats = {}
+        self.retired_stats = Counter()
+        self.running = True
+        self.reload_requested = False
+
+    def run(self):
+        """Supervise the workers until stopped; returns False if a worker kept failing and was given up on."""
+        if not self.server.reuse_port:
+            self.security_logger.critical("Supervisor mode requires reuse_port to be enabled")
+            raise ValueError("reuse_port must be enabled when running more than one worker")
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        self.honeypot_logger.info(f"Starting supervisor with {self.server.workers} workers")
+        for worker_id in range(self.server.workers):
+            self.spawn(worker_id)
+        last_report = time.monotonic()
+        try:
+            while self.running:
+                self.drain_stats(timeout=self.server.tick_interval)
+                self.reap_workers()
+                if self.reload_requested:
+                    self.reload_workers()
+                if time.monotonic() - last_report >= self.server.stats_interval:
+                    self.log_totals()
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_workers()
+            self.drain_stats(timeout=0)
+            self.log_totals()
+        return not self.failed
+
+    def spawn(self, worker_id):
+        process = self.context.Process(target=run_worker, name=f"honeypot-worker-{worker_id}",
+                                       args=(self.server, worker_id, self.stats_channel))
+        process.start()
+        self.processes[worker_id] = process
+
+    def reap_workers(self):
+        """Schedule restarts for workers that exited unexpectedly and start those whose delay is over."""
+        now = time.monotonic()
+        for worker_id, process in list(self.processes.items()):
+            if not self.running:
+                return
+            if worker_id in self.pending_restarts:
+                if now >= self.pending_restarts[worker_id]:
+                    del self.pending_restarts[worker_id]
+                    self.restarts[worker_id].append(now)
+                    self.spawn(worker_id)
+                continue
+            if process.is_alive():
+                continue
+            self.drain_stats(timeout=0)
+            self.retired_stats.update(self.worker_stats.pop(worker_id, {}))
+            recent = self.restarts.setdefault(worker_id, deque())
+            while recent and now - recent[0] > self.restart_window:
+                recent.popleft()
+            if len(recent) >= self.max_restarts:
+                self.security_logger.critical(
+                    f"Worker {worker_id} exited with code {process.exitcode} after {len(recent)} restarts "
+                    f"in {self.restart_window} seconds. Giving up.")
+                self.failed = True
+                self.running = False
+                return
+            delay = min(self.restart_delay * 2 ** len(recent), self.max_restart_delay)
+            self.security_logger.error(
+                f"Worker {worker_id} exited with code {process.exitcode}. Restarting in {delay:g} seconds.")
+            self.pending_restarts[worker_id] = now + delay
+
+    def drain_stats(self, timeout):
+        try:
+            worker_id, snapshot = self.stats_channel.get(timeout=timeout) if timeout else self.stats_channel.get_nowait()
+            self.worker_stats[worker_id] = snapshot
+            while True:
+                worker_id, snapshot = self.stats_channel.get_nowait()
+                self.worker_stats[worker_id] = snapshot
+        except queue.Empty:
+            pass
+
+    def merged_stats(self):
+        totals = Counter(self.retired_stats)
+        for snapshot in self.worker_stats.values():
+            totals.update(snapshot)
+        return totals
+
+    def log_totals(self):
+        totals = self.merged_stats()
+        if totals:
+            summary = ", ".join(f"{name}={value}" for name, value in sorted(totals.items()))
+            self.honeypot_logger.info(f"Aggregated stats across {len(self.processes)} workers: {summary}")
+
+    def handle_stop(self, signum, frame):
+        self.running = False
+
+    def handle_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def reload_workers(self):
+        """Reload the parent's copy of the config, so restarted workers get it too, then signal every worker."""
+        self.reload_requested = False
+        self.server.reload()
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    def stop_workers(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=5)
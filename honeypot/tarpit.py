@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from timer_wheel import TimerWheel
+
+
+def ssh_line(sent):
+    # Servers may send other lines before the version string (RFC 4253, 4.2), so clients keep waiting for it.
+    return b'%x\r\n' % random.getrandbits(32)
+
+
+def smtp_line(sent):
+    # A multi-line 220 greeting that never reaches its final line.
+    return b'220-%x ESMTP\r\n' % random.getrandbits(32)
+
+
+def http_line(sent):
+    if sent == 0:
+        return b'HTTP/1.1 200 OK\r\n'
+    # Header lines forever; the blank line that ends the header block never comes.
+    return b'X-Request-Id-%d: %x\r\n' % (sent, random.getrandbits(32))
+
+
+MODES = {'ssh': ssh_line, 'smtp': smtp_line, 'http': http_line}
+
+
+class TarpitSocket:
+    __slots__ = ('sock', 'addr', 'port', 'line', 'interval', 'started', 'alive', 'sent', 'timer', 'callback')
+
+    def __init__(self, sock, addr, port, line, interval, started):
+        self.sock = sock
+        self.addr = addr
+        self.port = port
+        self.line = line
+        self.interval = interval
+        self.started = started
+        # When the client was last known to be connected.
+        self.alive = started
+        self.sent = 0
+        self.timer = None
+        self.callback = None
+
+
+class Tarpit:
+    """Holds scanner connections open by dripping a few bytes every ``interval`` seconds.
+
+    ``ports`` maps a port to a mode (ssh, smtp or http) or to ``{"mode", "interval"}``.
+    One scheduler thread drives every socket from a TimerWheel, so a tarpitted
+    connection costs one small slotted struct and a timer, with no thread or
+    coroutine stack. A client that stops reading just fills its own buffers.
+    Before each drip the tarpit discards whatever the client sent and checks for
+    EOF, so a client that disconnected is released and credited only up to the
+    last drip it was still there for. At most ``max_sockets`` are held; further
+    connections are closed at once. Tarpitted sockets are not counted against
+    the connection budget, since holding them for hours is the point.
+    on_release(addr, port, seconds) is called from the scheduler thread as each
+    one is let go; held_seconds() covers the connections still held.
+    """
+    budgeted = False
+
+    def __init__(self, ports, interval=10, resolution=1.0, max_sockets=50000, logger=None, on_release=None):
+        self.modes = {}
+        for port, mode in ports.items():
+            options = mode if isinstance(mode, dict) else {'mode': mode}
+            if options['mode'] not in MODES:
+                raise ValueError(f"Unknown tarpit mode {options['mode']!r} for port {port}")
+            self.modes[int(port)] = (MODES[options['mode']], options.get('interval', interval))
+        self.resolution = resolution
+        self.max_sockets = max_sockets
+        self.logger = logger
+        self.on_release = on_release
+        self.now = time.monotonic()
+        self.wheel = TimerWheel(resolution, now=self.now)
+        self.pending = deque()
+        self.sockets = set()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='honeypot-tarpit', daemon=True)
+        self.thread.start()
+
+    def submit(self, conn, addr, port):
+        """Called from the engine thread with an admitted connection on a tarpit port."""
+        if len(self.sockets) + len(self.pending) >= self.max_sockets:
+            conn.close()
+            return
+        conn.setblocking(False)
+        self.pending.append((conn, addr, port))
+
+    def run(self):
+        while not self.stopping.wait(self.resolution):
+            self.now = time.monotonic()
+            while self.pending:
+                conn, addr, port = self.pending.popleft()
+                line, interval = self.modes[port]
+                entry = TarpitSocket(conn, addr, port, line, interval, self.now)
+                entry.callback = partial(self.drip, entry)
+                self.sockets.add(entry)
+                self.drip(entry)
+            self.wheel.advance(self.now)
+
+    def held_seconds(self):
+        """Seconds spent so far by the connections still held; may be called from any thread."""
+        now = time.monotonic()
+        return sum(now - entry.started for entry in list(self.sockets))
+
+    def drip(self, entry):
+        try:
+            if not entry.sock.recv(4096):
+                # EOF: the client has gone.
+                self.release(entry)
+                return
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.release(entry)
+            return
+        entry.alive = self.now
+        try:
+            entry.sock.send(entry.line(entry.sent))
+            entry.sent += 1
+        except BlockingIOError:
+            # The client is not reading and its buffers are full, which is just as good.
+            pass
+        except OSError:
+            self.release(entry)
+            return
+        entry.timer = self.wheel.schedule(self.now + entry.interval, entry.callback)
+
+    def release(self, entry):
+        self.sockets.discard(entry)
+        if entry.timer is not None:
+            entry.timer.cancel()
+        try:
+            entry.sock.close()
+        except OSError:
+            pass
+        seconds = entry.alive - entry.started
+        if self.logger:
+            self.logger.info("Tarpit released %s on port %s after %.0f seconds and %s lines",
+                             entry.addr, entry.port, seconds, entry.sent)
+        if self.on_release:
+            self.on_release(entry.addr, entry.port, seconds)
+
+    def close(self):
+        """Stop the scheduler and let every held connection go, accounting for its time."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        while self.pending:
+            self.pending.popleft()[0].close()
+        self.now = time.monotonic()
+        for entry in list(self.sockets):
+            entry.alive = self.now
+            self.release(entry)
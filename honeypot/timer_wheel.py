@@ -0,0 +1,76 @@
+import math
+
+
+class Timer:
+    __slots__ = ('deadline', 'tick', 'callback', 'cancelled')
+
+    def __init__(self, deadline, tick, callback):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) schedule and cancel, expiry cost proportional to elapsed slots.
+
+    Timers are rounded up to ``resolution`` seconds and hashed into ``slots`` buckets
+    by their tick; timers further out than one revolution simply stay in their bucket
+    until their tick comes round. Cancellation is lazy. Not thread-safe: schedule,
+    cancel and advance from one thread.
+    """
+
+    def __init__(self, resolution=1.0, slots=512, now=0.0):
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self.current_tick = self.tick_for(now)
+        self.pending = 0
+
+    def tick_for(self, when):
+        return math.ceil(when / self.resolution)
+
+    def schedule(self, deadline, callback):
+        tick = max(self.tick_for(deadline), self.current_tick + 1)
+        timer = Timer(deadline, tick, callback)
+        self.slots[tick % len(self.slots)].append(timer)
+        self.pending += 1
+        return timer
+
+    def advance(self, now):
+        """Run the callbacks of every timer due at or before now; returns how many fired."""
+        target = self.tick_for(now)
+        fired = 0
+        # After a long stall, visiting each slot once is enough.
+        steps = min(target - self.current_tick, len(self.slots))
+        for step in range(1, steps + 1):
+            tick = self.current_tick + step
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            due = []
+            remaining = []
+            for timer in slot:
+                if timer.cancelled:
+                    self.pending -= 1
+                elif timer.tick <= target:
+                    due.append(timer)
+                else:
+                    remaining.append(timer)
+            slot[:] = remaining
+            # Callbacks that re-arm themselves must land in a slot still ahead, not the one just emptied.
+            self.current_tick = tick
+            for timer in due:
+                self.pending -= 1
+                # An earlier callback in this batch may have cancelled it.
+                if timer.cancelled:
+                    continue
+                timer.callback()
+                fired += 1
+        self.current_tick = max(self.current_tick, target)
+        return fired
+
+    def __len__(self):
+        return self.pending
